@@ -0,0 +1,110 @@
+import asyncio
+import os
+from bisect import bisect_left
+from itertools import takewhile
+from typing import Iterable
+
+from database import get_current_usernames, get_requested_usernames, search_accounts
+from lru import LRUCache
+
+# Total usernames kept in memory across every cached index. Indexes are
+# built per user on their first keystroke and dropped least recently used.
+AUTOCOMPLETE_CACHE_USERNAMES = int(os.getenv("AUTOCOMPLETE_CACHE_USERNAMES", "2000000"))
+
+# How long a keystroke waits for a user's index to be built before
+# answering from the database instead
+AUTOCOMPLETE_BUILD_WAIT = 0.5
+
+# Discord shows at most 25 autocomplete choices
+MAX_CHOICES = 25
+
+# Where each index's usernames come from
+SOURCES = {
+    "followers": get_current_usernames,
+    "requested": get_requested_usernames,
+}
+
+
+class PrefixIndex:
+    """Usernames kept sorted so a prefix lookup is one binary search."""
+
+    def __init__(self, usernames: Iterable[str]):
+        self._usernames = sorted({username.lower() for username in usernames})
+
+    def __len__(self) -> int:
+        return len(self._usernames)
+
+    def complete(self, prefix: str, limit: int = MAX_CHOICES) -> list[str]:
+        """Return up to `limit` usernames starting with `prefix`, in order."""
+        prefix = prefix.strip().lstrip('@').lower()
+        start = bisect_left(self._usernames, prefix)
+        # Matches are contiguous, so they're the leading part of this slice
+        candidates = self._usernames[start:start + limit]
+        return list(takewhile(lambda username: username.startswith(prefix), candidates))
+
+
+_indexes = LRUCache(AUTOCOMPLETE_CACHE_USERNAMES, weigh=len)
+_building: dict[tuple, asyncio.Task] = {}
+
+
+async def _build(key: tuple) -> PrefixIndex:
+    user_id, guild_id, source = key
+    try:
+        usernames = await SOURCES[source](user_id, guild_id)
+        # Sorting a million names takes a while; keep the event loop free
+        index = await asyncio.to_thread(PrefixIndex, usernames)
+        # Only keep it if nothing was invalidated while it was being built
+        if _building.get(key) is asyncio.current_task():
+            _indexes.put(key, index)
+        return index
+    finally:
+        if _building.get(key) is asyncio.current_task():
+            del _building[key]
+
+
+async def complete_usernames(
+    user_id: int,
+    guild_id: int,
+    source: str,
+    prefix: str,
+    limit: int = MAX_CHOICES
+) -> list[str]:
+    """
+    Suggest usernames from a user's latest followers or requested list.
+
+    Answers from an in-memory index once it is built. A user's first
+    keystroke starts building it; if that takes longer than
+    AUTOCOMPLETE_BUILD_WAIT, the answer comes from the database instead.
+    """
+    key = (user_id, guild_id, source)
+    index = _indexes.get(key)
+    if index is None:
+        task = _building.get(key)
+        if task is None:
+            task = _building[key] = asyncio.create_task(_build(key))
+        try:
+            index = await asyncio.wait_for(asyncio.shield(task), AUTOCOMPLETE_BUILD_WAIT)
+        except asyncio.TimeoutError:
+            if source != "followers":
+                return []
+            prefix = prefix.strip().lstrip('@').lower()
+            matches = await search_accounts(
+                user_id, guild_id, prefix, snapshot_type=source, limit=limit
+            )
+            return [
+                match["username"] for match in matches
+                if match["current"] and match["username"].startswith(prefix)
+            ]
+    return index.complete(prefix, limit)
+
+
+def invalidate(user_id: int, guild_id: int):
+    """Forget a user's indexes after an upload or a requested-list change."""
+    for source in SOURCES:
+        _indexes.pop((user_id, guild_id, source))
+        _building.pop((user_id, guild_id, source), None)
+
+
+def cache_stats() -> dict:
+    """Hit/miss/eviction counters of the index cache."""
+    return _indexes.stats()
@@ -0,0 +1,84 @@
+"""
+Measure username autocomplete latency for a large follower list.
+
+Usage:
+    python benchmarks/bench_autocomplete.py [rows] [keystrokes]
+
+Saves one upload of `rows` random usernames to a temporary database, then
+times the first keystroke (which builds the user's index) and `keystrokes`
+further lookups of random prefixes, as an autocomplete callback makes them.
+"""
+import asyncio
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from snapshot_frame import SnapshotFrame
+
+DEFAULTS = [1_000_000, 10_000]
+ALPHABET = string.ascii_lowercase + string.digits + '._'
+
+
+def make_usernames(count: int) -> list[str]:
+    rng = random.Random(42)
+    usernames = set()
+    while len(usernames) < count:
+        usernames.add(''.join(rng.choices(ALPHABET, k=rng.randint(4, 20))))
+    return list(usernames)
+
+
+async def bench(rows: int, keystrokes: int):
+    import autocomplete
+    import database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = Path(tmp) / 'bench.db'
+        await database.init_db()
+        # Let the first keystroke wait for the index however long it takes
+        autocomplete.AUTOCOMPLETE_BUILD_WAIT = 60
+
+        usernames = make_usernames(rows)
+        await database.save_snapshot(1, 0, 'bench.csv', SnapshotFrame.from_records(
+            {'user_id': str(i), 'username': username, 'fullname': '',
+             'followed_by_you': 'NO', 'is_verified': 'NO', 'profile_url': ''}
+            for i, username in enumerate(usernames)
+        ))
+
+        start = time.perf_counter()
+        await autocomplete.complete_usernames(1, 0, 'followers', '')
+        build = time.perf_counter() - start
+
+        rng = random.Random(7)
+        latencies = []
+        for _ in range(keystrokes):
+            username = rng.choice(usernames)
+            prefix = username[:rng.randint(0, min(6, len(username)))]
+            start = time.perf_counter()
+            await autocomplete.complete_usernames(1, 0, 'followers', prefix)
+            latencies.append(time.perf_counter() - start)
+
+        await database.close_db()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(f'{rows:,} usernames: first keystroke (builds index) {build * 1000:.0f}ms')
+    print(
+        f'{keystrokes:,} keystrokes: p50 {statistics.median(latencies) * 1000:.3f}ms'
+        f'  p99 {p99 * 1000:.3f}ms  max {latencies[-1] * 1000:.3f}ms'
+    )
+
+
+def main():
+    args = [int(arg) for arg in sys.argv[1:]]
+    rows, keystrokes = args + DEFAULTS[len(args):]
+    asyncio.run(bench(rows, keystrokes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Measure save_snapshot throughput on synthetic follower exports.
+
+Usage:
+    python benchmarks/bench_ingest.py [rows ...]
+
+Each run uses a fresh temporary database and prints rows/sec.
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from snapshot_frame import SnapshotFrame
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def make_records(count: int) -> list[dict]:
+    """Build `count` follower records shaped like parse_instagram_csv output."""
+    return [
+        {
+            'user_id': str(1_000_000 + i),
+            'username': f'user_{i:07d}',
+            'fullname': f'User Number {i}',
+            'followed_by_you': 'YES' if i % 3 == 0 else 'NO',
+            'is_verified': 'YES' if i % 97 == 0 else 'NO',
+            'profile_url': f'https://www.instagram.com/user_{i:07d}',
+        }
+        for i in range(count)
+    ]
+
+
+async def bench(count: int):
+    import database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = Path(tmp) / 'bench.db'
+        await database.init_db()
+        records = SnapshotFrame.from_records(make_records(count))
+
+        start = time.perf_counter()
+        await database.save_snapshot(1, 0, 'bench.csv', records)
+        elapsed = time.perf_counter() - start
+
+        await database.close_db()
+
+    print(f'{count:>10,} rows  {elapsed:8.2f}s  {count / elapsed:>12,.0f} rows/sec')
+
+
+async def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    for count in sizes:
+        await bench(count)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+Measure database throughput while uploads and commands run at the same time.
+
+Usage:
+    python benchmarks/bench_mixed.py [writers] [readers] [rows]
+
+Each writer is a different user uploading a series of follower exports;
+each reader keeps running the queries behind /stats, /changes and /search
+against a user seeded up front. Uses a fresh temporary database and prints
+uploads/sec, reads/sec and read latency.
+"""
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_ingest import make_records
+from snapshot_frame import SnapshotFrame
+
+DEFAULTS = [4, 8, 20_000]
+UPLOADS_PER_WRITER = 5
+READER_USER_ID = 0
+
+
+def churned(records: list[dict], upload: int) -> SnapshotFrame:
+    """Drop and add about 1% of the followers between uploads."""
+    step = max(1, len(records) // 100)
+    kept = records[step * upload:]
+    extra = make_records(len(records) + step * upload)[len(records):]
+    return SnapshotFrame.from_records(kept + extra)
+
+
+async def write(database, user_id: int, records: list[dict]):
+    for upload in range(UPLOADS_PER_WRITER):
+        await database.save_snapshot(user_id, 0, 'bench.csv', churned(records, upload))
+
+
+async def read(database, snapshot_ids: list[int], stop: asyncio.Event, latencies: list[float]):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await database.get_latest_snapshot(READER_USER_ID, 0)
+        await database.get_snapshots(READER_USER_ID, 0)
+        await database.compare_snapshots(snapshot_ids[0], snapshot_ids[-1], limit=10)
+        await database.get_snapshot_records(snapshot_ids[-1])
+        latencies.append(time.perf_counter() - start)
+
+
+async def bench(writers: int, readers: int, rows: int):
+    import database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = Path(tmp) / 'bench.db'
+        await database.init_db()
+
+        records = make_records(rows)
+        snapshot_ids = [
+            await database.save_snapshot(READER_USER_ID, 0, 'seed.csv', churned(records, upload))
+            for upload in range(2)
+        ]
+
+        stop = asyncio.Event()
+        latencies: list[float] = []
+        reading = [
+            asyncio.create_task(read(database, snapshot_ids, stop, latencies))
+            for _ in range(readers)
+        ]
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            write(database, user_id, records) for user_id in range(1, writers + 1)
+        ))
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        await asyncio.gather(*reading)
+        await database.close_db()
+
+    uploads = writers * UPLOADS_PER_WRITER
+    print(f'{writers} writers x {UPLOADS_PER_WRITER} uploads of {rows:,} rows, {readers} readers')
+    print(f'  {elapsed:8.2f}s  {uploads / elapsed:8.2f} uploads/sec  {len(latencies) / elapsed:8.2f} reads/sec')
+    if latencies:
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95)]
+        print(
+            f'  read latency  p50 {statistics.median(latencies) * 1000:7.1f}ms'
+            f'  p95 {p95 * 1000:7.1f}ms  max {latencies[-1] * 1000:7.1f}ms'
+        )
+
+
+def main():
+    args = [int(arg) for arg in sys.argv[1:]]
+    writers, readers, rows = args + DEFAULTS[len(args):]
+    asyncio.run(bench(writers, readers, rows))
+
+
+if __name__ == '__main__':
+    main()
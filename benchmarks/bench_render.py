@@ -0,0 +1,88 @@
+"""
+Measure chart render latency in cold and warmed-up rendering workers.
+
+Usage:
+    python benchmarks/bench_render.py [uploads] [renders]
+
+For each chart, times the first render in a freshly started worker process
+that has not loaded matplotlib yet (how every worker started before
+rendering workers were warmed up), then the first and the median of
+`renders` further renders in a worker started by workers.py, which has
+already imported matplotlib and drawn every chart once. Plots cover
+`uploads` follower uploads.
+"""
+import asyncio
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+DEFAULTS = [60, 20]
+
+
+def make_args(uploads: int) -> dict[str, tuple]:
+    """Arguments for each chart, shaped like the bot's database rows."""
+    start = datetime(2024, 1, 1)
+    snapshots = [
+        {
+            'uploaded_at': (start + timedelta(days=7 * i)).isoformat(),
+            'total_followers': 1000 + 13 * i - (i % 5) * 9,
+            'snapshot_type': 'followers',
+        }
+        for i in range(uploads)
+    ]
+    latest = {
+        **snapshots[-1],
+        'mutual_count': 640, 'fan_count': 380,
+        'gained_count': 31, 'lost_count': 12, 'net_change': 19,
+    }
+    return {
+        'trend': (snapshots,),
+        'growth': (snapshots,),
+        'daily_growth': (snapshots,),
+        'pie': (640, 380, 95),
+        'changes': (latest,),
+        'dashboard': (snapshots, latest),
+    }
+
+
+async def timed(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+async def bench(uploads: int, renders: int):
+    import workers
+
+    print(f'{"chart":<12} {"cold first":>11} {"warm first":>11} {"warm p50":>9}   ({uploads} uploads)')
+    for chart, args in make_args(uploads).items():
+        # A worker that has been spawned but hasn't imported matplotlib
+        cold = workers.WorkerPool(1)
+        await cold.start()
+        cold_first = await timed(cold.run(workers._render, chart, *args))
+        await cold.close()
+
+        warm = workers.WorkerPool(1, initializer=workers._warm_renderer)
+        await warm.start()
+        warm_first = await timed(warm.run(workers._render, chart, *args))
+        latencies = [await timed(warm.run(workers._render, chart, *args)) for _ in range(renders)]
+        await warm.close()
+
+        print(
+            f'{chart:<12} {cold_first * 1000:9.0f}ms {warm_first * 1000:9.0f}ms'
+            f' {statistics.median(latencies) * 1000:7.0f}ms'
+        )
+
+
+def main():
+    args = [int(arg) for arg in sys.argv[1:]]
+    uploads, renders = args + DEFAULTS[len(args):]
+    asyncio.run(bench(uploads, renders))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,31 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
+import aiohttp
 import os
+import re
+import tempfile
 from dotenv import load_dotenv
 import asyncio
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
 from io import BytesIO
+from typing import AsyncIterator, BinaryIO, Optional
 
 from database import (
     init_db,
+    close_db,
     save_snapshot,
     get_snapshots,
+    get_snapshot,
     get_snapshot_records,
     get_latest_snapshot,
     get_all_snapshots_for_plotting,
     compare_snapshots,
+    get_recent_changes,
+    get_follow_history,
+    get_follow_tenure,
+    search_accounts,
     add_requested,
     remove_requested,
     get_requested,
@@ -21,14 +33,12 @@ from database import (
     clear_requested,
     check_requested_accepted
 )
-from csv_parser import parse_instagram_csv, parse_filename, analyze_follow_status
-from plotting import (
-    create_follower_trend_plot,
-    create_comparison_pie_chart,
-    create_change_bar_chart,
-    create_growth_rate_plot,
-    create_summary_dashboard
-)
+from autocomplete import complete_usernames, invalidate as invalidate_autocomplete
+from workers import run as run_in_worker, start_workers, warm_workers, stop_workers
+from chart_cache import render_chart
+from csv_parser import parse_instagram_csv, iter_instagram_csv, parse_filename, analyze_follow_status
+from growth import FORECAST_DAYS, growth_summary
+from snapshot_frame import SnapshotFrame
 
 load_dotenv()
 
@@ -38,7 +48,35 @@ intents = discord.Intents.default()
 intents.message_content = True
 intents.dm_messages = True  # Enable DM support
 
-bot = commands.Bot(command_prefix='!', intents=intents)
+
+class TrackerBot(commands.Bot):
+    """Bot that owns the database connection pool for its whole lifetime."""
+
+    async def setup_hook(self):
+        """Open the database and worker pools before connecting to Discord."""
+        await init_db()
+        # One HTTP session, reused for every attachment download
+        self.download_session = aiohttp.ClientSession()
+        start_workers()
+        # Rendering processes load matplotlib while the bot logs in
+        self.warm_up_task = asyncio.create_task(warm_workers())
+
+    async def close(self):
+        """Shut down the gateway connection, then the worker and database pools."""
+        await super().close()
+        if hasattr(self, 'download_session'):
+            await self.download_session.close()
+        await stop_workers()
+        await close_db()
+
+
+bot = TrackerBot(command_prefix='!', intents=intents)
+
+# Bytes read from Discord's CDN at a time when downloading an upload
+DOWNLOAD_BLOCK_SIZE = 256 * 1024
+
+# Most matches /search lists
+SEARCH_RESULTS = 25
 
 
 def get_guild_id(interaction_or_message) -> int:
@@ -50,10 +88,45 @@ def get_guild_id(interaction_or_message) -> int:
     return 0
 
 
+def format_date(value, fmt: str = "%b %d, %Y") -> str:
+    """Format a stored timestamp for display."""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).strftime(fmt)
+    return str(value)
+
+
+async def follower_autocomplete(
+    interaction: discord.Interaction,
+    current: str
+) -> list[app_commands.Choice[str]]:
+    """Suggest usernames from the latest followers upload."""
+    usernames = await complete_usernames(
+        interaction.user.id, get_guild_id(interaction), 'followers', current
+    )
+    return [app_commands.Choice(name=u, value=u) for u in usernames]
+
+
+async def requested_autocomplete(
+    interaction: discord.Interaction,
+    current: str
+) -> list[app_commands.Choice[str]]:
+    """Suggest requested usernames for the last name in a list being typed."""
+    partial = re.split(r'[\n,\s]+', current)[-1]
+    typed = current[:len(current) - len(partial)]
+    usernames = await complete_usernames(
+        interaction.user.id, get_guild_id(interaction), 'requested', partial
+    )
+    # Choice values are capped at 100 characters by Discord
+    return [
+        app_commands.Choice(name=u, value=typed + u)
+        for u in usernames
+        if len(typed + u) <= 100
+    ]
+
+
 @bot.event
 async def on_ready():
-    """Initialize bot and sync commands."""
-    await init_db()
+    """Sync commands once connected."""
     try:
         synced = await bot.tree.sync()
         print(f'Synced {len(synced)} command(s)')
@@ -63,6 +136,22 @@ async def on_ready():
     print(f'Bot can be used in DMs! Just message me directly.')
 
 
+@bot.tree.error
+async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    """Tell the user when a command's background work timed out or was lost."""
+    if (
+        isinstance(error, app_commands.CommandInvokeError)
+        and isinstance(error.original, (TimeoutError, BrokenProcessPool))
+    ):
+        message = "⏳ That took too long to process. Please try again in a moment."
+        if interaction.response.is_done():
+            await interaction.followup.send(message)
+        else:
+            await interaction.response.send_message(message)
+        return
+    await app_commands.CommandTree.on_error(bot.tree, interaction, error)
+
+
 @bot.event
 async def on_message(message: discord.Message):
     """Handle direct CSV uploads without slash commands."""
@@ -138,21 +227,74 @@ async def send_welcome_message(message: discord.Message):
     await message.reply(embed=embed)
 
 
+def add_accepted_field(embed: discord.Embed, snapshot: dict):
+    """Show how many requested users a followers upload found following back."""
+    accepted = snapshot.get('accepted_count') if snapshot else None
+    if accepted:
+        embed.add_field(
+            name="🎉 Requests Accepted",
+            value=f"**{accepted}** user(s) from your requested list now follow you (`/requested_check`)",
+            inline=False
+        )
+
+
+async def download_attachment(attachment: discord.Attachment, file: BinaryIO):
+    """Stream an attachment into `file` a block at a time."""
+    async with bot.download_session.get(attachment.url) as response:
+        response.raise_for_status()
+        async for block in response.content.iter_chunked(DOWNLOAD_BLOCK_SIZE):
+            # Disk writes can stall, so they happen off the event loop
+            await asyncio.to_thread(file.write, block)
+    file.seek(0)
+
+
+async def ingest_csv_attachment(
+    attachment: discord.Attachment,
+    user_id: int,
+    guild_id: int,
+    file_type: str
+) -> tuple[Optional[int], dict]:
+    """
+    Save an uploaded CSV as a new snapshot without loading it all at once.
+
+    The file is downloaded to a temporary file, then parsed in chunks that
+    are handed to save_snapshot() as they come, so memory use stays flat
+    however large the export is.
+
+    Returns:
+        tuple: (snapshot ID, or None if the file had no rows; metadata dict)
+    """
+    with tempfile.TemporaryFile() as file:
+        await download_attachment(attachment, file)
+        reader = iter_instagram_csv(file, attachment.filename)
+        try:
+            # Parsing is CPU-bound, so it happens off the event loop
+            records, metadata = await asyncio.to_thread(next, reader)
+            if not records:
+                return None, metadata
+
+            async def chunks() -> AsyncIterator[SnapshotFrame]:
+                nonlocal metadata
+                yield records
+                while chunk := await asyncio.to_thread(next, reader, None):
+                    records_chunk, metadata = chunk
+                    yield records_chunk
+
+            snapshot_id = await save_snapshot(
+                user_id, guild_id, attachment.filename, chunks(), file_type
+            )
+            return snapshot_id, metadata
+        finally:
+            reader.close()
+
+
 async def process_csv_upload(message: discord.Message, attachment: discord.Attachment):
     """Process a CSV file uploaded via message."""
     async with message.channel.typing():
         try:
-            content = await attachment.read()
-            records, metadata = parse_instagram_csv(content, attachment.filename)
-
-            if not records:
-                await message.reply("❌ Couldn't parse that CSV. Make sure it's an Instagram export!")
-                return
-
             # Use detected type from filename, or fallback to simple detection
             file_info = parse_filename(attachment.filename)
             file_type = file_info['file_type']
-            ig_username = file_info.get('ig_username') or metadata.get('ig_username')
 
             user_id = message.author.id
             guild_id = get_guild_id(message)
@@ -161,12 +303,16 @@ async def process_csv_upload(message: discord.Message, attachment: discord.Attac
             prev_snapshot = await get_latest_snapshot(user_id, guild_id, file_type)
 
             # Save new snapshot
-            snapshot_id = await save_snapshot(
-                user_id, guild_id, attachment.filename, records, file_type
+            snapshot_id, metadata = await ingest_csv_attachment(
+                attachment, user_id, guild_id, file_type
             )
 
-            # Analyze
-            analysis = analyze_follow_status(records)
+            if snapshot_id is None:
+                await message.reply("❌ Couldn't parse that CSV. Make sure it's an Instagram export!")
+                return
+
+            invalidate_autocomplete(user_id, guild_id)
+            ig_username = file_info.get('ig_username') or metadata.get('ig_username')
 
             # Build response
             title = f"✅ Got it! Processed your {file_type}"
@@ -181,7 +327,7 @@ async def process_csv_upload(message: discord.Message, attachment: discord.Attac
 
             # Comparison with previous
             if prev_snapshot:
-                comparison = await compare_snapshots(prev_snapshot['id'], snapshot_id)
+                comparison = await compare_snapshots(prev_snapshot['id'], snapshot_id, limit=3)
                 net = comparison['net_change']
 
                 if net > 0:
@@ -195,16 +341,18 @@ async def process_csv_upload(message: discord.Message, attachment: discord.Attac
 
                 if comparison['gained']:
                     names = ', '.join(f"@{r['username']}" for r in comparison['gained'][:3])
-                    if len(comparison['gained']) > 3:
-                        names += f" +{len(comparison['gained']) - 3} more"
+                    if comparison['gained_count'] > 3:
+                        names += f" +{comparison['gained_count'] - 3} more"
                     embed.add_field(name="🆕 New", value=names, inline=True)
 
                 if comparison['lost']:
                     names = ', '.join(f"@{r['username']}" for r in comparison['lost'][:3])
-                    if len(comparison['lost']) > 3:
-                        names += f" +{len(comparison['lost']) - 3} more"
+                    if comparison['lost_count'] > 3:
+                        names += f" +{comparison['lost_count'] - 3} more"
                     embed.add_field(name="👋 Lost", value=names, inline=True)
 
+            add_accepted_field(embed, await get_snapshot(snapshot_id))
+
             embed.set_footer(text="Type 'stats' for full dashboard or 'changes' for details")
 
             await message.reply(embed=embed)
@@ -226,21 +374,9 @@ async def send_stats_from_message(message: discord.Message):
             return
 
         latest = await get_latest_snapshot(user_id, guild_id, "followers")
-        if latest:
-            records = await get_snapshot_records(latest['id'])
-            analysis = analyze_follow_status(records)
-        else:
-            analysis = {'followers': [], 'mutual': [], 'fans': []}
-
-        comparison = None
         follower_snapshots = [s for s in snapshots if s.get('snapshot_type') == 'followers']
-        if len(follower_snapshots) >= 2:
-            comparison = await compare_snapshots(
-                follower_snapshots[-2]['id'],
-                follower_snapshots[-1]['id']
-            )
 
-        dashboard_buf = create_summary_dashboard(follower_snapshots, analysis, comparison)
+        dashboard_buf = BytesIO(await render_chart('dashboard', follower_snapshots, latest))
         file = discord.File(dashboard_buf, filename="dashboard.png")
 
         embed = discord.Embed(title="📊 Your Dashboard", color=discord.Color.blurple())
@@ -263,13 +399,7 @@ async def send_history_from_message(message: discord.Message):
     embed = discord.Embed(title="📜 Your Upload History", color=discord.Color.blurple())
 
     for s in snapshots:
-        from datetime import datetime
-        uploaded_at = s['uploaded_at']
-        if isinstance(uploaded_at, str):
-            dt = datetime.fromisoformat(uploaded_at.replace('Z', '+00:00'))
-            date_str = dt.strftime("%b %d, %Y")
-        else:
-            date_str = str(uploaded_at)
+        date_str = format_date(s['uploaded_at'])
 
         embed.add_field(
             name=f"#{s['id']} - {date_str}",
@@ -292,8 +422,8 @@ async def send_changes_from_message(message: discord.Message):
         return
 
     async with message.channel.typing():
-        comparison = await compare_snapshots(snapshots[1]['id'], snapshots[0]['id'])
-        chart_buf = create_change_bar_chart(comparison)
+        comparison = await compare_snapshots(snapshots[1]['id'], snapshots[0]['id'], limit=5)
+        chart_buf = BytesIO(await render_chart('changes', comparison))
         file = discord.File(chart_buf, filename="changes.png")
 
         embed = discord.Embed(title="📊 Recent Changes", color=discord.Color.blurple())
@@ -327,7 +457,7 @@ async def send_nonfollowers_from_message(message: discord.Message):
         return
 
     records = await get_snapshot_records(latest['id'])
-    analysis = analyze_follow_status(records)
+    analysis = await asyncio.to_thread(analyze_follow_status, records)
     fans = analysis['fans'][:10]
 
     if not fans:
@@ -368,13 +498,6 @@ async def upload_csv(
         return
 
     try:
-        content = await file.read()
-        records, metadata = parse_instagram_csv(content)
-
-        if not records:
-            await interaction.followup.send("❌ No valid records found in the CSV file.")
-            return
-
         guild_id = get_guild_id(interaction)
 
         # Get previous snapshot for comparison
@@ -385,16 +508,18 @@ async def upload_csv(
         )
 
         # Save new snapshot
-        snapshot_id = await save_snapshot(
+        snapshot_id, metadata = await ingest_csv_attachment(
+            file,
             interaction.user.id,
             guild_id,
-            file.filename,
-            records,
             file_type
         )
 
-        # Analyze relationships
-        analysis = analyze_follow_status(records)
+        if snapshot_id is None:
+            await interaction.followup.send("❌ No valid records found in the CSV file.")
+            return
+
+        invalidate_autocomplete(interaction.user.id, guild_id)
 
         # Build response embed
         embed = discord.Embed(
@@ -428,7 +553,7 @@ async def upload_csv(
 
         # Add comparison if previous data exists
         if prev_snapshot:
-            comparison = await compare_snapshots(prev_snapshot['id'], snapshot_id)
+            comparison = await compare_snapshots(prev_snapshot['id'], snapshot_id, limit=5)
 
             change_text = []
             if comparison['gained_count'] > 0:
@@ -449,7 +574,7 @@ async def upload_csv(
             # Show some gained/lost usernames
             if comparison['gained']:
                 gained_names = [r['username'] for r in comparison['gained'][:5]]
-                more = len(comparison['gained']) - 5
+                more = comparison['gained_count'] - 5
                 gained_text = ", ".join(f"@{n}" for n in gained_names)
                 if more > 0:
                     gained_text += f" (+{more} more)"
@@ -461,7 +586,7 @@ async def upload_csv(
 
             if comparison['lost']:
                 lost_names = [r['username'] for r in comparison['lost'][:5]]
-                more = len(comparison['lost']) - 5
+                more = comparison['lost_count'] - 5
                 lost_text = ", ".join(f"@{n}" for n in lost_names)
                 if more > 0:
                     lost_text += f" (+{more} more)"
@@ -471,6 +596,8 @@ async def upload_csv(
                     inline=False
                 )
 
+        add_accepted_field(embed, await get_snapshot(snapshot_id))
+
         embed.set_footer(text=f"Snapshot ID: {snapshot_id} | Use /stats for detailed analysis")
 
         await interaction.followup.send(embed=embed)
@@ -497,29 +624,16 @@ async def stats(interaction: discord.Interaction):
         )
         return
 
-    # Get latest snapshot and its records
+    # Latest snapshot carries the counts and changes shown on the dashboard
     latest = await get_latest_snapshot(
         interaction.user.id,
         guild_id,
         "followers"
     )
-
-    if latest:
-        records = await get_snapshot_records(latest['id'])
-        analysis = analyze_follow_status(records)
-    else:
-        analysis = {'followers': [], 'mutual': [], 'fans': []}
-
-    # Get comparison if we have multiple snapshots
-    comparison = None
     follower_snapshots = [s for s in snapshots if s.get('snapshot_type') == 'followers']
-    if len(follower_snapshots) >= 2:
-        prev_id = follower_snapshots[-2]['id']
-        curr_id = follower_snapshots[-1]['id']
-        comparison = await compare_snapshots(prev_id, curr_id)
 
     # Create dashboard
-    dashboard_buf = create_summary_dashboard(follower_snapshots, analysis, comparison)
+    dashboard_buf = BytesIO(await render_chart('dashboard', follower_snapshots, latest))
 
     file = discord.File(dashboard_buf, filename="dashboard.png")
 
@@ -540,20 +654,19 @@ async def trend(interaction: discord.Interaction):
     await interaction.response.defer(thinking=True)
 
     guild_id = get_guild_id(interaction)
-    snapshots = await get_all_snapshots_for_plotting(
+    follower_snapshots = await get_all_snapshots_for_plotting(
         interaction.user.id,
-        guild_id
+        guild_id,
+        "followers"
     )
 
-    follower_snapshots = [s for s in snapshots if s.get('snapshot_type', 'followers') == 'followers']
-
     if not follower_snapshots:
         await interaction.followup.send(
             "❌ No follower data found! Upload a CSV file first using `/upload`"
         )
         return
 
-    plot_buf = create_follower_trend_plot(follower_snapshots)
+    plot_buf = BytesIO(await render_chart('trend', follower_snapshots))
     file = discord.File(plot_buf, filename="trend.png")
 
     embed = discord.Embed(
@@ -567,33 +680,59 @@ async def trend(interaction: discord.Interaction):
 
 
 @bot.tree.command(name="growth", description="View your follower growth rate")
+@app_commands.describe(mode="Compare uploads, or show growth per day with averages and a forecast")
+@app_commands.choices(mode=[
+    app_commands.Choice(name="Between uploads", value="uploads"),
+    app_commands.Choice(name="Per day (7/30-day averages, forecast)", value="daily")
+])
 @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
-async def growth(interaction: discord.Interaction):
-    """Show growth rate between uploads."""
+async def growth(interaction: discord.Interaction, mode: str = "uploads"):
+    """Show growth rate between uploads, or per day."""
     await interaction.response.defer(thinking=True)
 
     guild_id = get_guild_id(interaction)
-    snapshots = await get_all_snapshots_for_plotting(
+    follower_snapshots = await get_all_snapshots_for_plotting(
         interaction.user.id,
-        guild_id
+        guild_id,
+        "followers"
     )
 
-    follower_snapshots = [s for s in snapshots if s.get('snapshot_type', 'followers') == 'followers']
-
     if len(follower_snapshots) < 2:
         await interaction.followup.send(
             "❌ Need at least 2 uploads to show growth rate. Upload more data!"
         )
         return
 
-    plot_buf = create_growth_rate_plot(follower_snapshots)
-    file = discord.File(plot_buf, filename="growth.png")
+    if mode == "daily":
+        plot_buf = BytesIO(await render_chart('daily_growth', follower_snapshots))
+        summary = await asyncio.to_thread(growth_summary, follower_snapshots)
 
-    embed = discord.Embed(
-        title="📈 Follower Growth Rate",
-        description="Percentage change between each upload",
-        color=discord.Color.green()
-    )
+        embed = discord.Embed(
+            title="📈 Daily Follower Growth",
+            description=(
+                f"Follower counts over {summary['days']} day(s), "
+                "spread evenly over the days between uploads"
+            ),
+            color=discord.Color.green()
+        )
+        for window, average in summary['average'].items():
+            embed.add_field(name=f"📅 {window}-Day Average", value=f"**{average:+.1f}**/day", inline=True)
+        embed.add_field(name="📊 Daily Rate", value=f"**{summary['percent']:+.2f}%**/day", inline=True)
+        embed.add_field(
+            name=f"🔮 In {FORECAST_DAYS} Days",
+            value=f"**~{summary['forecast']:,}** (now {summary['latest']:,})",
+            inline=False
+        )
+    else:
+        plot_buf = BytesIO(await render_chart('growth', follower_snapshots))
+
+        embed = discord.Embed(
+            title="📈 Follower Growth Rate",
+            description="Percentage change between each upload",
+            color=discord.Color.green()
+        )
+
+    file = discord.File(plot_buf, filename="growth.png")
     embed.set_image(url="attachment://growth.png")
 
     await interaction.followup.send(embed=embed, file=file)
@@ -625,7 +764,7 @@ async def non_followers(interaction: discord.Interaction, limit: int = 20):
 
     # Filter those with "Followed by you" = YES in followers list
     # These are mutual follows - we want to find who you follow that doesn't follow back
-    analysis = analyze_follow_status(records)
+    analysis = await asyncio.to_thread(analyze_follow_status, records)
 
     # In followers list, people with "NO" are fans (they follow you, you don't follow them)
     # This command should show the opposite - you need following.csv for complete picture
@@ -676,36 +815,58 @@ async def non_followers(interaction: discord.Interaction, limit: int = 20):
 
 
 @bot.tree.command(name="changes", description="View detailed changes from your last upload")
+@app_commands.describe(days="Combine every upload from the last N days instead of just the last one")
 @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
-async def changes(interaction: discord.Interaction):
+async def changes(interaction: discord.Interaction, days: app_commands.Range[int, 1, 365] = None):
     """Show detailed comparison with previous upload."""
     await interaction.response.defer(thinking=True)
 
     guild_id = get_guild_id(interaction)
-    snapshots = await get_snapshots(interaction.user.id, guild_id, limit=2)
 
-    if len(snapshots) < 2:
-        await interaction.followup.send(
-            "❌ Need at least 2 uploads to compare changes. Upload more data!"
+    if days:
+        comparison = await get_recent_changes(
+            interaction.user.id, guild_id, "followers", days=days, limit=10
         )
-        return
 
-    # snapshots are ordered DESC, so [0] is newest, [1] is previous
-    comparison = await compare_snapshots(snapshots[1]['id'], snapshots[0]['id'])
+        if not comparison['gained_count'] and not comparison['lost_count']:
+            await interaction.followup.send(
+                f"❌ No follower changes logged in the last {days} day(s)."
+            )
+            return
+
+        title = f"📊 Follower Changes (Last {days} Days)"
+        previous_label = f"{days} days ago"
+    else:
+        snapshots = await get_snapshots(interaction.user.id, guild_id, limit=2)
+
+        if len(snapshots) < 2:
+            await interaction.followup.send(
+                "❌ Need at least 2 uploads to compare changes. Upload more data!"
+            )
+            return
+
+        # snapshots are ordered DESC, so [0] is newest, [1] is previous
+        comparison = await compare_snapshots(snapshots[1]['id'], snapshots[0]['id'], limit=10)
+        title = "📊 Follower Changes"
+        previous_label = "Previous"
 
     # Create change chart
-    chart_buf = create_change_bar_chart(comparison)
+    chart_buf = BytesIO(await render_chart(
+        'changes',
+        comparison,
+        f'Follower Changes in the Last {days} Days' if days else None
+    ))
     file = discord.File(chart_buf, filename="changes.png")
 
     embed = discord.Embed(
-        title="📊 Follower Changes",
+        title=title,
         color=discord.Color.blurple()
     )
 
     embed.add_field(
         name="📈 Summary",
         value=(
-            f"Previous: **{comparison['old_total']}** followers\n"
+            f"{previous_label}: **{comparison['old_total']}** followers\n"
             f"Current: **{comparison['new_total']}** followers\n"
             f"Net Change: **{comparison['net_change']:+d}**"
         ),
@@ -715,8 +876,8 @@ async def changes(interaction: discord.Interaction):
     if comparison['gained']:
         gained_list = [f"@{r['username']}" for r in comparison['gained'][:10]]
         gained_text = "\n".join(gained_list)
-        if len(comparison['gained']) > 10:
-            gained_text += f"\n... and {len(comparison['gained']) - 10} more"
+        if comparison['gained_count'] > 10:
+            gained_text += f"\n... and {comparison['gained_count'] - 10} more"
         embed.add_field(
             name=f"🆕 New Followers (+{comparison['gained_count']})",
             value=gained_text or "None",
@@ -726,8 +887,8 @@ async def changes(interaction: discord.Interaction):
     if comparison['lost']:
         lost_list = [f"@{r['username']}" for r in comparison['lost'][:10]]
         lost_text = "\n".join(lost_list)
-        if len(comparison['lost']) > 10:
-            lost_text += f"\n... and {len(comparison['lost']) - 10} more"
+        if comparison['lost_count'] > 10:
+            lost_text += f"\n... and {comparison['lost_count'] - 10} more"
         embed.add_field(
             name=f"👋 Unfollowed (-{comparison['lost_count']})",
             value=lost_text or "None",
@@ -760,14 +921,7 @@ async def history(interaction: discord.Interaction):
     )
 
     for snapshot in snapshots:
-        uploaded_at = snapshot['uploaded_at']
-        if isinstance(uploaded_at, str):
-            # Format the date nicely
-            from datetime import datetime
-            dt = datetime.fromisoformat(uploaded_at.replace('Z', '+00:00'))
-            date_str = dt.strftime("%b %d, %Y at %H:%M")
-        else:
-            date_str = str(uploaded_at)
+        date_str = format_date(snapshot['uploaded_at'], "%b %d, %Y at %H:%M")
 
         embed.add_field(
             name=f"#{snapshot['id']} - {snapshot['snapshot_type'].title()}",
@@ -803,13 +957,10 @@ async def breakdown(interaction: discord.Interaction):
         )
         return
 
-    records = await get_snapshot_records(latest['id'])
-    analysis = analyze_follow_status(records)
-
-    mutual = len(analysis['mutual'])
-    fans = len(analysis['fans'])
+    mutual = latest['mutual_count']
+    fans = latest['fan_count']
 
-    chart_buf = create_comparison_pie_chart(mutual, fans, 0)
+    chart_buf = BytesIO(await render_chart('pie', mutual, fans, 0))
     file = discord.File(chart_buf, filename="breakdown.png")
 
     embed = discord.Embed(
@@ -827,9 +978,13 @@ async def breakdown(interaction: discord.Interaction):
 
 
 @bot.tree.command(name="search", description="Search for a specific user in your data")
-@app_commands.describe(username="Instagram username to search for")
+@app_commands.describe(
+    username="Username or name to search for (partial matches and typos are fine)",
+    history="Also search followers from earlier uploads"
+)
+@app_commands.autocomplete(username=follower_autocomplete)
 @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
-async def search_user(interaction: discord.Interaction, username: str):
+async def search_user(interaction: discord.Interaction, username: str, history: bool = False):
     """Search for a user in follower data."""
     await interaction.response.defer(thinking=True)
 
@@ -846,14 +1001,13 @@ async def search_user(interaction: discord.Interaction, username: str):
         )
         return
 
-    records = await get_snapshot_records(latest['id'])
-
-    # Search for username (case-insensitive partial match)
-    search_lower = username.lower()
-    matches = [
-        r for r in records
-        if search_lower in r['username'].lower() or search_lower in r['fullname'].lower()
-    ]
+    matches = await search_accounts(
+        interaction.user.id,
+        guild_id,
+        username,
+        snapshot_id=None if history else latest['id'],
+        limit=SEARCH_RESULTS
+    )
 
     if not matches:
         await interaction.followup.send(f"❌ No user found matching `{username}`")
@@ -861,26 +1015,86 @@ async def search_user(interaction: discord.Interaction, username: str):
 
     embed = discord.Embed(
         title=f"🔍 Search Results for '{username}'",
-        description=f"Found {len(matches)} match(es)",
+        description=f"Found {len(matches)}{'+' if len(matches) == SEARCH_RESULTS else ''} match(es)",
         color=discord.Color.blurple()
     )
 
+    tenure = await get_follow_tenure(
+        interaction.user.id,
+        guild_id,
+        [match['username'] for match in matches[:10]]
+    )
+
     for match in matches[:10]:
-        verified = "✅" if match['is_verified'] == 'YES' else ""
-        follows_back = "✅ You follow back" if match['followed_by_you'] == 'YES' else "❌ You don't follow back"
+        verified = "✅" if match.get('is_verified') == 'YES' else ""
+        similar = " (similar)" if match['match'] == 'fuzzy' else ""
+        if history:
+            follows_back = "✅ Still following you" if match['current'] else "👋 No longer following you"
+        elif match['followed_by_you'] == 'YES':
+            follows_back = "✅ You follow back"
+        else:
+            follows_back = "❌ You don't follow back"
+
+        since = ""
+        if match['username'] in tenure:
+            first_seen = tenure[match['username']]
+            at_least = "at least " if first_seen['since_first_upload'] else ""
+            since = f"**Following since:** {at_least}{format_date(first_seen['first_seen_at'])}\n"
 
         embed.add_field(
-            name=f"@{match['username']} {verified}",
+            name=f"@{match['username']} {verified}{similar}",
             value=(
                 f"**Name:** {match['fullname'] or 'N/A'}\n"
                 f"**Status:** {follows_back}\n"
+                f"{since}"
                 f"[View Profile]({match['profile_url']})"
             ),
             inline=True
         )
 
     if len(matches) > 10:
-        embed.set_footer(text=f"Showing 10 of {len(matches)} results")
+        embed.set_footer(text=f"Showing the 10 best of {len(matches)} results")
+
+    await interaction.followup.send(embed=embed)
+
+
+@bot.tree.command(name="follow_history", description="See when an account followed and unfollowed you")
+@app_commands.describe(username="Instagram username to look up")
+@app_commands.autocomplete(username=follower_autocomplete)
+@app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+async def follow_history(interaction: discord.Interaction, username: str):
+    """Show every follow/unfollow episode for one account."""
+    await interaction.response.defer(thinking=True)
+
+    guild_id = get_guild_id(interaction)
+    episodes = await get_follow_history(interaction.user.id, guild_id, username)
+
+    if not episodes:
+        await interaction.followup.send(
+            f"❌ `{username}` hasn't appeared in any of your uploads"
+        )
+        return
+
+    embed = discord.Embed(
+        title=f"🕰️ Follow History for @{username.strip().lstrip('@')}",
+        description=f"{len(episodes)} period(s) across your uploads",
+        color=discord.Color.blurple()
+    )
+
+    for episode in episodes[:25]:
+        start = format_date(episode['first_seen_at'])
+        if episode['since_first_upload']:
+            start = f"before {start}"
+        end = format_date(episode['last_seen_at']) if episode['last_seen_at'] else "now"
+
+        embed.add_field(
+            name=episode['snapshot_type'].title(),
+            value=f"📅 {start} → {end}",
+            inline=True
+        )
+
+    if len(episodes) > 25:
+        embed.set_footer(text=f"Showing 25 of {len(episodes)} periods")
 
     await interaction.followup.send(embed=embed)
 
@@ -903,7 +1117,7 @@ async def demo(interaction: discord.Interaction):
             content = f.read()
 
         filename = "IGFollow_rajj__singhh_287_followers.csv"
-        records, metadata = parse_instagram_csv(content, filename)
+        records, metadata = await run_in_worker(parse_instagram_csv, content, filename)
 
         if not records:
             await interaction.followup.send("❌ Couldn't parse sample file.")
@@ -923,9 +1137,7 @@ async def demo(interaction: discord.Interaction):
             records,
             file_type
         )
-
-        # Analyze
-        analysis = analyze_follow_status(records)
+        invalidate_autocomplete(interaction.user.id, guild_id)
 
         embed = discord.Embed(
             title=f"🎉 Demo loaded: @{ig_username}'s {file_type}",
@@ -986,7 +1198,8 @@ async def requested_list(interaction: discord.Interaction):
     # Format the list
     user_list = []
     for i, r in enumerate(requested[:50], 1):
-        user_list.append(f"{i}. @{r['username']}")
+        accepted = " ✅" if r.get('accepted_at') else ""
+        user_list.append(f"{i}. @{r['username']}{accepted}")
 
     # Split into chunks
     chunk_size = 15
@@ -1008,7 +1221,6 @@ async def requested_add_cmd(interaction: discord.Interaction, usernames: str):
     await interaction.response.defer(thinking=True)
 
     # Parse usernames - split by newlines, commas, or spaces
-    import re
     username_list = re.split(r'[\n,\s]+', usernames)
     username_list = [u.strip().lstrip('@') for u in username_list if u.strip()]
 
@@ -1018,6 +1230,7 @@ async def requested_add_cmd(interaction: discord.Interaction, usernames: str):
 
     guild_id = get_guild_id(interaction)
     added, skipped = await add_requested(interaction.user.id, guild_id, username_list)
+    invalidate_autocomplete(interaction.user.id, guild_id)
 
     embed = discord.Embed(
         title="📝 Added to Requested List",
@@ -1044,12 +1257,12 @@ async def requested_add_cmd(interaction: discord.Interaction, usernames: str):
 
 @bot.tree.command(name="requested_remove", description="Remove usernames from your pending requests list")
 @app_commands.describe(usernames="Usernames to remove (separated by newlines, commas, or spaces)")
+@app_commands.autocomplete(usernames=requested_autocomplete)
 @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
 async def requested_remove_cmd(interaction: discord.Interaction, usernames: str):
     """Remove usernames from the requested list."""
     await interaction.response.defer(thinking=True)
 
-    import re
     username_list = re.split(r'[\n,\s]+', usernames)
     username_list = [u.strip().lstrip('@') for u in username_list if u.strip()]
 
@@ -1059,6 +1272,7 @@ async def requested_remove_cmd(interaction: discord.Interaction, usernames: str)
 
     guild_id = get_guild_id(interaction)
     removed = await remove_requested(interaction.user.id, guild_id, username_list)
+    invalidate_autocomplete(interaction.user.id, guild_id)
 
     total = await get_requested_count(interaction.user.id, guild_id)
 
@@ -1097,6 +1311,7 @@ async def requested_clear_cmd(interaction: discord.Interaction):
 
             self.confirmed = True
             cleared = await clear_requested(interaction.user.id, guild_id)
+            invalidate_autocomplete(interaction.user.id, guild_id)
 
             embed = discord.Embed(
                 title="🗑️ Requested List Cleared",
@@ -1147,8 +1362,7 @@ async def requested_check_cmd(interaction: discord.Interaction):
         )
         return
 
-    records = await get_snapshot_records(latest['id'])
-    accepted = await check_requested_accepted(interaction.user.id, guild_id, records)
+    accepted = await check_requested_accepted(interaction.user.id, guild_id)
 
     if not accepted:
         embed = discord.Embed(
@@ -1190,12 +1404,13 @@ async def help_command(interaction: discord.Interaction):
         ("📤 /upload", "Upload your Instagram CSV file"),
         ("📊 /stats", "View your dashboard"),
         ("📈 /trend", "Follower count trend"),
-        ("📉 /growth", "Growth rate between uploads"),
+        ("📉 /growth", "Growth rate between uploads or per day"),
         ("🔄 /changes", "See who followed/unfollowed"),
         ("👀 /nonfollowers", "Fans you don't follow back"),
         ("🥧 /breakdown", "Pie chart of relationships"),
         ("📜 /history", "Upload history"),
         ("🔍 /search", "Search for a username"),
+        ("🕰️ /follow_history", "When someone followed/unfollowed"),
         ("🎉 /demo", "Load sample data"),
     ]
 
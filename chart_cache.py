@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from database import DATABASE_PATH
+from lru import LRUCache
+from workers import render
+
+# Bytes of rendered PNGs kept in memory and on disk. Charts are keyed by a
+# hash of their inputs, so an upload that changes the data gets a new key
+# and stale images simply age out.
+CHART_CACHE_MEMORY_BYTES = int(os.getenv("CHART_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+CHART_CACHE_DISK_BYTES = int(os.getenv("CHART_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+CHART_CACHE_DIR = Path(os.getenv("CHART_CACHE_DIR", DATABASE_PATH.parent / "chart_cache"))
+
+# Part of every key, so images drawn by older chart code are never served
+CHART_CODE_VERSION = hashlib.sha256(b"".join(
+    (Path(__file__).parent / module).read_bytes() for module in ("plotting.py", "growth.py")
+)).hexdigest()[:16]
+
+
+def chart_key(chart: str, *args) -> str:
+    """Hash of a chart name and the data it is drawn from."""
+    payload = json.dumps(
+        [CHART_CODE_VERSION, chart, args],
+        sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class DiskCache:
+    """
+    PNG files named by their key, dropped least recently used.
+
+    Files left by earlier runs are indexed on first use, oldest first by
+    modification time, which is bumped on every hit. Disk errors count as
+    misses: the cache is never a reason for a chart to fail.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self._index = LRUCache(max_bytes, weigh=lambda size: size, on_evict=self._delete)
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.png"
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        self.directory.mkdir(parents=True, exist_ok=True)
+        files = []
+        for path in self.directory.glob("*.png"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(files):
+            self._index.put(key, size)
+
+    def _delete(self, key: str, size: int):
+        self._path(key).unlink(missing_ok=True)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached PNG, or None."""
+        with self._lock:
+            try:
+                self._load()
+                if self._index.get(key) is None:
+                    return None
+                path = self._path(key)
+                png = path.read_bytes()
+                os.utime(path)
+                return png
+            except OSError:
+                self._index.pop(key)
+                return None
+
+    def put(self, key: str, png: bytes):
+        """Store a PNG, deleting the least recently used ones to make room."""
+        with self._lock:
+            try:
+                self._load()
+                if len(png) > self._index.max_size:
+                    return
+                path = self._path(key)
+                partial = path.with_suffix(".tmp")
+                partial.write_bytes(png)
+                os.replace(partial, path)
+                self._index.put(key, len(png))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        return self._index.stats()
+
+
+_memory = LRUCache(CHART_CACHE_MEMORY_BYTES, weigh=len)
+_disk = DiskCache(CHART_CACHE_DIR, CHART_CACHE_DISK_BYTES)
+_rendering: dict[str, asyncio.Task] = {}
+
+
+async def _load_or_render(key: str, chart: str, args: tuple) -> bytes:
+    try:
+        png = await asyncio.to_thread(_disk.get, key)
+        if png is None:
+            png = await render(chart, *args)
+            await asyncio.to_thread(_disk.put, key, png)
+        _memory.put(key, png)
+        return png
+    finally:
+        del _rendering[key]
+
+
+async def render_chart(chart: str, *args) -> bytes:
+    """
+    Get a chart's PNG from the cache, rendering it only if it isn't there.
+
+    Takes the same arguments as workers.render(). Requests for a chart
+    that is already being rendered wait for that render instead of
+    starting another one.
+    """
+    key = chart_key(chart, *args)
+    png = _memory.get(key)
+    if png is not None:
+        return png
+    task = _rendering.get(key)
+    if task is None:
+        task = _rendering[key] = asyncio.create_task(_load_or_render(key, chart, args))
+    # Don't let one impatient caller cancel the render for everyone else
+    return await asyncio.shield(task)
+
+
+def cache_stats() -> dict:
+    """Hit/miss/eviction counters of the memory and disk tiers."""
+    return {"memory": _memory.stats(), "disk": _disk.stats()}
@@ -0,0 +1,197 @@
+"""
+Check that the queries behind bot commands are served by indexes.
+
+Usage:
+    python check_query_plans.py [-v]
+
+Seeds a temporary database, runs the database.py functions the bot calls
+on every command or upload, and runs EXPLAIN QUERY PLAN on each statement
+they send to SQLite. Exits with status 1 if any of them scans a whole
+table or sorts rows in a temporary B-tree, unless it is listed in
+EXPECTED_SORTS, or can't be planned at all.
+"""
+import argparse
+import asyncio
+import re
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+import database
+from snapshot_frame import SnapshotFrame
+
+# Fragments of statements that are allowed to sort. Each one sorts only
+# the rows it has already narrowed down, which no index can order for it.
+EXPECTED_SORTS = (
+    # Pages of gained/lost accounts are ordered by username after the diff,
+    # and a user's own accounts after picking out the searched prefix
+    "ORDER BY a.username LIMIT",
+    # Deltas since the last checkpoint, and changes inside a time window,
+    # are grouped per account
+    "GROUP BY account_id",
+    # Substring matches are ranked once they have been picked out
+    "ORDER BY tier,",
+    # A dozen or so query trigrams, ordered by how common they are
+    "ORDER BY doc",
+)
+
+# A full pass over a table or index. Subqueries are planned separately, and
+# full-text lookups show up as a SCAN of the virtual table.
+TABLE_SCAN = re.compile(r"^SCAN (?!\(subquery|CONSTANT ROW|json_each)(?!.*VIRTUAL TABLE)")
+TEMP_SORT = re.compile(r"USE TEMP B-TREE")
+
+# Statements with no lookup to plan: settings, transactions, temp table
+# teardown, plain INSERT ... VALUES rows and FTS5's own bookkeeping
+IGNORED = re.compile(
+    r"^\s*(PRAGMA|BEGIN|COMMIT|ROLLBACK|DROP TABLE|INSERT\b[^;]*?\bVALUES\s*\(|--)"
+    r"|.*'main'\.'",
+    re.I
+)
+
+# Temp tables exist only on the connection that created them, so they are
+# created again on the one running EXPLAIN before statements using them.
+# They hold just the rows staged for the statement reading them (an upload,
+# one side of a diff), so a full pass over one is expected.
+CREATE_TEMP = re.compile(r"^\s*CREATE TEMP TABLE (\w+)", re.I)
+TABLE_REFERENCE = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.I)
+SCANNED = re.compile(r"^SCAN (\w+)")
+
+
+def records_for(start: int, count: int) -> SnapshotFrame:
+    return SnapshotFrame.from_records(
+        {
+            'user_id': str(i),
+            'username': f'user_{i:06d}',
+            'fullname': f'User {i}',
+            'followed_by_you': 'YES' if i % 3 == 0 else 'NO',
+            'is_verified': 'YES' if i % 50 == 0 else 'NO',
+            'profile_url': '',
+        }
+        for i in range(start, start + count)
+    )
+
+
+async def seed():
+    """Give the planner a few users with several uploads each."""
+    for user_id in range(1, 6):
+        for upload in range(4):
+            await database.save_snapshot(
+                user_id, 0, 'seed.csv', records_for(upload * 20, 500)
+            )
+            await database.save_snapshot(
+                user_id, 0, 'seed.csv', records_for(upload * 10, 300), 'following'
+            )
+        await database.add_requested(user_id, 0, [f'user_{i:06d}' for i in range(600, 620)])
+
+
+async def exercise():
+    """Call every function the bot uses while handling commands and uploads."""
+    snapshots = await database.get_snapshots(1, 0, limit=10)
+    latest = await database.get_latest_snapshot(1, 0)
+    await database.get_all_snapshots_for_plotting(1, 0)
+    await database.get_snapshot(latest['id'])
+    await database.compare_snapshots(latest['parent_id'], latest['id'], limit=10)
+    await database.compare_snapshots(snapshots[-1]['id'], latest['id'], limit=10)
+    # Once decoded, snapshots are compared in memory instead
+    await database.get_snapshot_records(latest['id'])
+    await database.get_snapshot_records(snapshots[-1]['id'])
+    await database.compare_snapshots(snapshots[-1]['id'], latest['id'], limit=10)
+    await database.get_recent_changes(1, 0, days=30, limit=10)
+    await database.get_follow_history(1, 0, 'user_000070')
+    await database.get_follow_tenure(1, 0, ['user_000070', 'user_000100'])
+    await database.search_accounts(1, 0, 'user_0001', snapshot_id=latest['id'])
+    await database.search_accounts(1, 0, 'us')
+    await database.search_accounts(1, 0, 'usre_00007')
+    await database.get_current_usernames(1, 0)
+    await database.get_requested_usernames(1, 0)
+    await database.save_snapshot(1, 0, 'check.csv', records_for(95, 500))
+    await database.add_requested(1, 0, ['user_000700', 'user_000701'])
+    await database.remove_requested(1, 0, ['user_000700'])
+    await database.get_requested(1, 0)
+    await database.get_requested_count(1, 0)
+    await database.check_requested_accepted(1, 0)
+    await database.clear_requested(2, 0)
+
+
+async def capture() -> tuple[Path, list[str]]:
+    """Seed a database and return every statement the bot's functions send."""
+    path = Path(tempfile.mkdtemp()) / 'plans.db'
+    database.DATABASE_PATH = path
+    await database.init_db()
+    statements: list[str] = []
+    try:
+        await seed()
+        for pool in (database._pool, database._writer):
+            for db in pool._connections:
+                await db.set_trace_callback(statements.append)
+        await exercise()
+    finally:
+        await database.close_db()
+    return path, statements
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> list[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def temp_names(sql: str, temp_tables: set[str]) -> set[str]:
+    """Names and aliases the statement reads temp tables by."""
+    names = set()
+    for table, alias in TABLE_REFERENCE.findall(sql):
+        if table in temp_tables:
+            names.update((table, alias))
+    return names
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-v', '--verbose', action='store_true', help='Print every plan')
+    args = parser.parse_args()
+
+    path, statements = asyncio.run(capture())
+    conn = sqlite3.connect(path)
+
+    failures = 0
+    checked = set()
+    temp_tables = set()
+    for sql in statements:
+        sql = sql.strip()
+        create = CREATE_TEMP.match(sql)
+        if create:
+            if create[1] not in temp_tables:
+                conn.execute(sql)
+                temp_tables.add(create[1])
+            continue
+        if IGNORED.match(sql) or sql in checked:
+            continue
+        checked.add(sql)
+
+        try:
+            plan = explain(conn, sql)
+        except sqlite3.OperationalError as e:
+            print(f'FAIL: {e}: ' + ' '.join(sql.split())[:200])
+            failures += 1
+            continue
+
+        staged = temp_names(sql, temp_tables)
+        problems = [
+            line for line in plan
+            if TABLE_SCAN.search(line) and SCANNED.match(line)[1] not in staged
+        ]
+        if not any(fragment in sql for fragment in EXPECTED_SORTS):
+            problems += [line for line in plan if TEMP_SORT.search(line)]
+
+        if problems or args.verbose:
+            print(('FAIL' if problems else 'ok') + ': ' + ' '.join(sql.split())[:200])
+            for line in plan:
+                print(f'    {line}')
+        failures += bool(problems)
+
+    conn.close()
+    print(f'{len(checked)} statement(s) checked, {failures} problem(s)')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
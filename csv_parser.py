@@ -1,7 +1,25 @@
 import pandas as pd
 import io
 import re
-from typing import Optional
+from typing import BinaryIO, Iterator, Optional
+
+from snapshot_frame import (
+    FLAG_FOLLOWED_BY_YOU,
+    FLAG_NOT_FOLLOWED_BY_YOU,
+    FLAG_VERIFIED,
+    SnapshotFrame,
+    pack_flag_columns
+)
+
+# Text columns kept from each export row; profile URLs are derived from the
+# username and avatars aren't kept
+TEXT_FIELDS = ('user_id', 'username', 'fullname')
+
+# YES/NO columns, compared in upper case
+FLAG_FIELDS = ('followed_by_you', 'is_verified')
+
+# Rows parsed at a time by iter_instagram_csv()
+CSV_CHUNK_SIZE = 50_000
 
 
 def parse_filename(filename: str) -> dict:
@@ -44,35 +62,30 @@ def parse_filename(filename: str) -> dict:
     return result
 
 
-def parse_instagram_csv(content: bytes | str, filename: str = None) -> tuple[list[dict], dict]:
-    """
-    Parse Instagram follower/following CSV file.
+# Expected columns mapping
+COLUMN_MAP = {
+    'user_id': ['user_id', 'userid', 'id'],
+    'username': ['username', 'user_name', 'handle'],
+    'fullname': ['fullname', 'full_name', 'name', 'display_name'],
+    'followed_by_you': ['followed_by_you', 'following', 'you_follow'],
+    'is_verified': ['is_verified', 'verified'],
+    'profile_url': ['profile_url', 'url', 'profile'],
+    'avatar_url': ['avatar_url', 'avatar', 'picture']
+}
 
-    Returns:
-        tuple: (list of records, metadata dict)
-    """
-    if isinstance(content, bytes):
-        content = content.decode('utf-8-sig')  # Handle BOM
 
-    df = pd.read_csv(io.StringIO(content))
+# Read every field as the text it was exported as; empty cells are ''
+READ_CSV_OPTIONS = {'dtype': object, 'na_filter': False}
+
 
+def _frame_records(df: pd.DataFrame) -> tuple[SnapshotFrame, dict]:
+    """Turn a DataFrame of export rows into records and their counts."""
     # Normalize column names
     df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_')
 
-    # Expected columns mapping
-    column_map = {
-        'user_id': ['user_id', 'userid', 'id'],
-        'username': ['username', 'user_name', 'handle'],
-        'fullname': ['fullname', 'full_name', 'name', 'display_name'],
-        'followed_by_you': ['followed_by_you', 'following', 'you_follow'],
-        'is_verified': ['is_verified', 'verified'],
-        'profile_url': ['profile_url', 'url', 'profile'],
-        'avatar_url': ['avatar_url', 'avatar', 'picture']
-    }
-
     # Rename columns to standard names
     rename_map = {}
-    for standard, variants in column_map.items():
+    for standard, variants in COLUMN_MAP.items():
         for variant in variants:
             if variant in df.columns:
                 rename_map[variant] = standard
@@ -80,51 +93,94 @@ def parse_instagram_csv(content: bytes | str, filename: str = None) -> tuple[lis
 
     df = df.rename(columns=rename_map)
 
-    # Fill NaN values
-    df = df.fillna('')
-
-    records = []
-    for _, row in df.iterrows():
-        record = {
-            'user_id': str(row.get('user_id', '')),
-            'username': str(row.get('username', '')),
-            'fullname': str(row.get('fullname', '')),
-            'followed_by_you': str(row.get('followed_by_you', '')).upper(),
-            'is_verified': str(row.get('is_verified', '')).upper(),
-            'profile_url': str(row.get('profile_url', '')),
-        }
-        records.append(record)
+    # Convert whole columns at once; missing columns become ''
+    columns = {}
+    for field in TEXT_FIELDS + FLAG_FIELDS:
+        if field not in df.columns:
+            columns[field] = [''] * len(df)
+        elif field in FLAG_FIELDS:
+            columns[field] = df[field].str.upper().to_numpy()
+        else:
+            columns[field] = df[field].tolist()
+
+    records = SnapshotFrame(
+        columns['user_id'],
+        columns['username'],
+        columns['fullname'],
+        pack_flag_columns(columns['followed_by_you'], columns['is_verified'])
+    )
 
     # Calculate metadata
-    total = len(records)
-    following_count = sum(1 for r in records if r['followed_by_you'] == 'YES')
-    not_following_count = sum(1 for r in records if r['followed_by_you'] == 'NO')
-    verified_count = sum(1 for r in records if r['is_verified'] == 'YES')
-
     metadata = {
-        'total': total,
-        'following_back': following_count,
-        'not_following_back': not_following_count,
-        'verified': verified_count
+        'total': len(records),
+        'following_back': records.count(FLAG_FOLLOWED_BY_YOU),
+        'not_following_back': records.count(FLAG_NOT_FOLLOWED_BY_YOU),
+        'verified': records.count(FLAG_VERIFIED)
     }
 
-    # Add filename metadata if provided
+    return records, metadata
+
+
+def _add_filename_metadata(metadata: dict, filename: Optional[str]):
     if filename:
         file_meta = parse_filename(filename)
         metadata['ig_username'] = file_meta['ig_username']
         metadata['detected_type'] = file_meta['file_type']
 
+
+def parse_instagram_csv(content: bytes | str, filename: str = None) -> tuple[SnapshotFrame, dict]:
+    """
+    Parse Instagram follower/following CSV file.
+
+    Returns:
+        tuple: (SnapshotFrame of records, metadata dict)
+    """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')  # Handle BOM
+
+    df = pd.read_csv(io.StringIO(content), **READ_CSV_OPTIONS)
+    records, metadata = _frame_records(df)
+
+    # Add filename metadata if provided
+    _add_filename_metadata(metadata, filename)
+
     return records, metadata
 
 
-def analyze_follow_status(records: list[dict]) -> dict:
+def iter_instagram_csv(
+    source: BinaryIO,
+    filename: str = None,
+    chunk_size: int = CSV_CHUNK_SIZE
+) -> Iterator[tuple[SnapshotFrame, dict]]:
+    """
+    Parse an Instagram CSV file `chunk_size` rows at a time.
+
+    Only one chunk of rows is held in memory at once, however large the
+    export. Always yields at least one (possibly empty) chunk.
+
+    Yields:
+        tuple: (records in this chunk, metadata counted so far)
+    """
+    metadata = {'total': 0, 'following_back': 0, 'not_following_back': 0, 'verified': 0}
+    _add_filename_metadata(metadata, filename)
+
+    with pd.read_csv(
+        source, encoding='utf-8-sig', chunksize=chunk_size, **READ_CSV_OPTIONS
+    ) as reader:
+        for df in reader:
+            records, counts = _frame_records(df)
+            for key, count in counts.items():
+                metadata[key] += count
+            yield records, dict(metadata)
+
+
+def analyze_follow_status(records: SnapshotFrame) -> dict:
     """Analyze follow relationships from records."""
-    following_you = [r for r in records]  # All records in followers list follow you
-    you_follow = [r for r in records if r['followed_by_you'] == 'YES']
-    you_dont_follow = [r for r in records if r['followed_by_you'] == 'NO']
+    you_follow = records.where(FLAG_FOLLOWED_BY_YOU)
+    you_dont_follow = records.where(FLAG_NOT_FOLLOWED_BY_YOU)
 
     return {
-        'followers': following_you,
+        'followers': records,  # All records in followers list follow you
         'you_follow_back': you_follow,
         'you_dont_follow_back': you_dont_follow,
         'mutual': you_follow,
@@ -132,49 +188,44 @@ def analyze_follow_status(records: list[dict]) -> dict:
     }
 
 
+def _not_in(records: SnapshotFrame, other: SnapshotFrame) -> SnapshotFrame:
+    """The records whose username (ignoring case) isn't in `other`."""
+    usernames = {username.lower() for username in other.usernames}
+    return records.take([
+        index for index, username in enumerate(records.usernames)
+        if username.lower() not in usernames
+    ])
+
+
 def find_non_followers(
-    followers_records: list[dict],
-    following_records: list[dict]
-) -> list[dict]:
+    followers_records: SnapshotFrame,
+    following_records: SnapshotFrame
+) -> SnapshotFrame:
     """
     Find people you follow who don't follow you back.
 
     Args:
-        followers_records: List of people who follow you
-        following_records: List of people you follow
+        followers_records: People who follow you
+        following_records: People you follow
 
     Returns:
-        List of people you follow who don't follow back
+        The people you follow who don't follow back
     """
-    follower_usernames = {r['username'].lower() for r in followers_records}
-
-    non_followers = [
-        r for r in following_records
-        if r['username'].lower() not in follower_usernames
-    ]
-
-    return non_followers
+    return _not_in(following_records, followers_records)
 
 
 def find_fans(
-    followers_records: list[dict],
-    following_records: list[dict]
-) -> list[dict]:
+    followers_records: SnapshotFrame,
+    following_records: SnapshotFrame
+) -> SnapshotFrame:
     """
     Find people who follow you but you don't follow back (fans).
 
     Args:
-        followers_records: List of people who follow you
-        following_records: List of people you follow
+        followers_records: People who follow you
+        following_records: People you follow
 
     Returns:
-        List of fans (followers you don't follow back)
+        Fans (followers you don't follow back)
     """
-    following_usernames = {r['username'].lower() for r in following_records}
-
-    fans = [
-        r for r in followers_records
-        if r['username'].lower() not in following_usernames
-    ]
-
-    return fans
+    return _not_in(followers_records, following_records)
@@ -1,135 +1,1175 @@
 import aiosqlite
+import asyncio
 import json
 import os
+import re
+from collections import deque
+from contextlib import asynccontextmanager
 from datetime import datetime
+from difflib import SequenceMatcher
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterable, AsyncIterator, Optional
+
+from lru import LRUCache
+from snapshot_frame import (
+    FLAG_FOLLOWED_BY_YOU,
+    FLAG_NOT_FOLLOWED_BY_YOU,
+    FLAG_VERIFIED,
+    FLAG_NOT_VERIFIED,
+    PROFILE_URL_PREFIX,
+    SnapshotFrame
+)
+from snapshot_series import SnapshotSeries
 
 # Use environment variable or default to local path
 DATABASE_PATH = Path(os.getenv("DATABASE_PATH", Path(__file__).parent / "follower_data.db"))
 
+# Number of long-lived read connections kept open by the pool. Writes always
+# go through one extra connection so uploads queue up instead of fighting
+# over SQLite's write lock.
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "4"))
+
+# Applied to every connection. The database runs in WAL mode (set once in
+# init_db), where NORMAL sync is still crash-safe and readers never wait
+# for a writer.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",    # 64 MiB per connection
+    "PRAGMA mmap_size = 268435456",  # 256 MiB
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+# Rows sent to SQLite per executemany() call when saving a snapshot
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
+
+# Store a full copy of a snapshot at least every N uploads; the uploads in
+# between only store the rows that changed since the previous upload
+SNAPSHOT_CHECKPOINT_INTERVAL = int(os.getenv("SNAPSHOT_CHECKPOINT_INTERVAL", "30"))
+
+# Uploads kept in memory across every cached upload history. A user's
+# history is read from the database on their first chart and then kept up
+# to date by save_snapshot(); histories are dropped least recently used.
+SERIES_CACHE_UPLOADS = int(os.getenv("SERIES_CACHE_UPLOADS", "1000000"))
+
+# Approximate bytes of decoded snapshot contents kept in memory. A
+# snapshot's records never change once saved, so they are kept until
+# dropped least recently used.
+SNAPSHOT_CACHE_BYTES = int(os.getenv("SNAPSHOT_CACHE_BYTES", str(256 * 1024 * 1024)))
+
+# Values of record_deltas.change
+DELTA_ADDED = 1
+DELTA_UPDATED = 0
+DELTA_REMOVED = -1
+
+# search_accounts(): how results are labelled, best first. Fuzzy matches
+# are looked up only when there aren't enough of the others, and need at
+# least this similarity (0-1) to the query.
+SEARCH_MATCHES = ("exact", "prefix", "name", "substring")
+SEARCH_FUZZY_MIN_SIMILARITY = 0.6
+SEARCH_FUZZY_CANDIDATES = 200
+# Upper bound on index entries read to find fuzzy candidates
+SEARCH_FUZZY_MAX_POSTINGS = 20000
+
+# Recomputes follow_intervals from every upload. Snapshots stored as deltas
+# contribute their change log; ones still stored as full copies (saved
+# before delta storage and not yet converted by compact_snapshots()) are
+# diffed against the upload before them. An account's gains and losses
+# alternate, so each interval ends at the loss right after its gain.
+REBUILD_FOLLOW_INTERVALS = f"""
+    DELETE FROM follow_intervals;
+
+    INSERT INTO follow_intervals (
+        user_id, guild_id, snapshot_type, account_id,
+        first_seen_snapshot_id, last_seen_snapshot_id
+    )
+    WITH legacy AS (
+        SELECT s.id, s.user_id, s.guild_id, s.snapshot_type,
+               (SELECT MAX(p.id) FROM snapshots p
+                WHERE p.user_id = s.user_id AND p.guild_id = s.guild_id
+                  AND p.snapshot_type = s.snapshot_type AND p.id < s.id) AS prev_id
+        FROM snapshots s
+        WHERE s.checkpoint_id IS NULL
+    ),
+    events AS (
+        SELECT s.user_id, s.guild_id, s.snapshot_type, r.account_id,
+               s.id AS snapshot_id, {DELTA_ADDED} AS change, NULL AS last_seen_id
+        FROM records r
+        JOIN snapshots s ON s.id = r.snapshot_id
+        WHERE s.parent_id IS NULL AND s.checkpoint_id IS NOT NULL
+        UNION ALL
+        SELECT c.user_id, c.guild_id, c.snapshot_type, c.account_id,
+               c.snapshot_id, c.change, e.parent_id
+        FROM changes c
+        JOIN snapshots e ON e.id = c.snapshot_id
+        UNION ALL
+        SELECT l.user_id, l.guild_id, l.snapshot_type, r.account_id,
+               l.id, {DELTA_ADDED}, NULL
+        FROM legacy l
+        JOIN records r ON r.snapshot_id = l.id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM records p
+            WHERE p.snapshot_id = l.prev_id AND p.account_id = r.account_id
+        )
+        UNION ALL
+        SELECT l.user_id, l.guild_id, l.snapshot_type, r.account_id,
+               l.id, {DELTA_REMOVED}, l.prev_id
+        FROM legacy l
+        JOIN records r ON r.snapshot_id = l.prev_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM records n
+            WHERE n.snapshot_id = l.id AND n.account_id = r.account_id
+        )
+    ),
+    ordered AS (
+        SELECT *,
+               LEAD(change) OVER account AS next_change,
+               LEAD(last_seen_id) OVER account AS next_last_seen_id
+        FROM events
+        WINDOW account AS (
+            PARTITION BY user_id, guild_id, snapshot_type, account_id
+            ORDER BY snapshot_id
+        )
+    )
+    SELECT user_id, guild_id, snapshot_type, account_id, snapshot_id,
+           CASE WHEN next_change = {DELTA_REMOVED} THEN next_last_seen_id END
+    FROM ordered
+    WHERE change = {DELTA_ADDED};
+"""
+
+# Schema upgrades applied in order by init_db(). PRAGMA user_version stores
+# how many of them have already run against the database file.
+MIGRATIONS = [
+    # 1: delta-encoded snapshot storage
+    """
+    ALTER TABLE snapshots ADD COLUMN parent_id INTEGER;
+    ALTER TABLE snapshots ADD COLUMN checkpoint_id INTEGER;
+
+    CREATE TABLE record_deltas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        snapshot_id INTEGER NOT NULL,
+        change INTEGER NOT NULL,
+        ig_user_id TEXT,
+        username TEXT NOT NULL,
+        fullname TEXT,
+        followed_by_you TEXT,
+        is_verified TEXT,
+        profile_url TEXT,
+        record_type TEXT DEFAULT 'follower',
+        FOREIGN KEY (snapshot_id) REFERENCES snapshots(id)
+    );
+
+    CREATE INDEX idx_record_deltas_snapshot
+    ON record_deltas(snapshot_id, change, username);
+
+    CREATE INDEX idx_snapshots_checkpoint
+    ON snapshots(checkpoint_id);
+    """,
+
+    # 2: shared accounts table; records and deltas keep only integer keys
+    #    and packed flags
+    """
+    CREATE TABLE accounts (
+        id INTEGER PRIMARY KEY,
+        username TEXT NOT NULL UNIQUE,
+        ig_user_id TEXT,
+        fullname TEXT
+    );
+
+    INSERT INTO accounts (username, ig_user_id, fullname)
+    SELECT username, ig_user_id, fullname FROM (
+        SELECT username, ig_user_id, fullname, MAX(snapshot_id)
+        FROM (
+            SELECT snapshot_id, username, ig_user_id, fullname FROM records
+            UNION ALL
+            SELECT snapshot_id, username, ig_user_id, fullname FROM record_deltas
+        )
+        GROUP BY username
+    );
+
+    CREATE TABLE records_v2 (
+        snapshot_id INTEGER NOT NULL REFERENCES snapshots(id),
+        account_id INTEGER NOT NULL REFERENCES accounts(id),
+        flags INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (snapshot_id, account_id)
+    ) WITHOUT ROWID;
+
+    INSERT OR IGNORE INTO records_v2 (snapshot_id, account_id, flags)
+    SELECT r.snapshot_id, a.id,
+           (CASE r.followed_by_you WHEN 'YES' THEN 1 WHEN 'NO' THEN 2 ELSE 0 END)
+         | (CASE r.is_verified WHEN 'YES' THEN 4 WHEN 'NO' THEN 8 ELSE 0 END)
+    FROM records r JOIN accounts a ON a.username = r.username;
+
+    CREATE TABLE record_deltas_v2 (
+        snapshot_id INTEGER NOT NULL REFERENCES snapshots(id),
+        account_id INTEGER NOT NULL REFERENCES accounts(id),
+        change INTEGER NOT NULL,
+        flags INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (snapshot_id, account_id)
+    ) WITHOUT ROWID;
+
+    INSERT OR IGNORE INTO record_deltas_v2 (snapshot_id, account_id, change, flags)
+    SELECT d.snapshot_id, a.id, d.change,
+           (CASE d.followed_by_you WHEN 'YES' THEN 1 WHEN 'NO' THEN 2 ELSE 0 END)
+         | (CASE d.is_verified WHEN 'YES' THEN 4 WHEN 'NO' THEN 8 ELSE 0 END)
+    FROM record_deltas d JOIN accounts a ON a.username = d.username;
+
+    DROP TABLE records;
+    DROP TABLE record_deltas;
+    ALTER TABLE records_v2 RENAME TO records;
+    ALTER TABLE record_deltas_v2 RENAME TO record_deltas;
+
+    CREATE INDEX idx_record_deltas_change
+    ON record_deltas(snapshot_id, change);
+    """,
+
+    # 3: per-snapshot aggregates computed at ingest time
+    """
+    ALTER TABLE snapshots ADD COLUMN mutual_count INTEGER;
+    ALTER TABLE snapshots ADD COLUMN fan_count INTEGER;
+    ALTER TABLE snapshots ADD COLUMN verified_count INTEGER;
+    ALTER TABLE snapshots ADD COLUMN gained_count INTEGER;
+    ALTER TABLE snapshots ADD COLUMN lost_count INTEGER;
+    ALTER TABLE snapshots ADD COLUMN net_change INTEGER;
+    """,
+
+    # 4: change log of gained/lost accounts per upload
+    f"""
+    CREATE TABLE changes (
+        snapshot_id INTEGER NOT NULL REFERENCES snapshots(id),
+        account_id INTEGER NOT NULL REFERENCES accounts(id),
+        user_id INTEGER NOT NULL,
+        guild_id INTEGER NOT NULL,
+        snapshot_type TEXT NOT NULL,
+        change INTEGER NOT NULL,
+        flags INTEGER NOT NULL DEFAULT 0,
+        changed_at TIMESTAMP NOT NULL,
+        PRIMARY KEY (snapshot_id, account_id)
+    ) WITHOUT ROWID;
+
+    CREATE INDEX idx_changes_user_time
+    ON changes(user_id, guild_id, snapshot_type, changed_at);
+
+    INSERT INTO changes (
+        snapshot_id, account_id, user_id, guild_id,
+        snapshot_type, change, flags, changed_at
+    )
+    SELECT d.snapshot_id, d.account_id, s.user_id, s.guild_id,
+           s.snapshot_type, d.change, d.flags, s.uploaded_at
+    FROM record_deltas d
+    JOIN snapshots s ON s.id = d.snapshot_id
+    WHERE d.change != {DELTA_UPDATED};
+    """,
+
+    # 5: first/last seen interval per account and tracked series. Open
+    #    intervals (still present in the latest upload) have no last_seen.
+    f"""
+    CREATE TABLE follow_intervals (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        guild_id INTEGER NOT NULL,
+        snapshot_type TEXT NOT NULL,
+        account_id INTEGER NOT NULL REFERENCES accounts(id),
+        first_seen_snapshot_id INTEGER NOT NULL REFERENCES snapshots(id),
+        last_seen_snapshot_id INTEGER REFERENCES snapshots(id)
+    );
+
+    CREATE UNIQUE INDEX idx_follow_intervals_open
+    ON follow_intervals(user_id, guild_id, snapshot_type, account_id)
+    WHERE last_seen_snapshot_id IS NULL;
+
+    CREATE INDEX idx_follow_intervals_account
+    ON follow_intervals(user_id, guild_id, account_id);
+
+    CREATE INDEX idx_changes_account
+    ON changes(account_id, change, snapshot_id);
+
+    {REBUILD_FOLLOW_INTERVALS}
+    """,
+
+    # 6: indexes shaped like the lookups the bot runs on every command, so
+    #    the latest upload, upload history and requested list are read in
+    #    index order instead of being sorted. Checked by check_query_plans.py.
+    """
+    DROP INDEX IF EXISTS idx_snapshots_user;
+
+    CREATE INDEX idx_snapshots_series
+    ON snapshots(user_id, guild_id, snapshot_type, uploaded_at);
+
+    CREATE INDEX idx_snapshots_user_time
+    ON snapshots(user_id, guild_id, uploaded_at);
+
+    DROP INDEX idx_follow_intervals_account;
+    CREATE INDEX idx_follow_intervals_account
+    ON follow_intervals(user_id, guild_id, account_id, first_seen_snapshot_id);
+
+    DROP INDEX IF EXISTS idx_requested_user;
+    CREATE INDEX idx_requested_user_time
+    ON requested(user_id, guild_id, added_at);
+    """,
+
+    # 7: trigram full-text index over account usernames and full names,
+    #    kept in sync with `accounts` by triggers
+    """
+    CREATE VIRTUAL TABLE accounts_fts USING fts5(
+        username, fullname,
+        content='accounts', content_rowid='id', tokenize='trigram'
+    );
+
+    INSERT INTO accounts_fts(accounts_fts) VALUES ('rebuild');
+
+    CREATE VIRTUAL TABLE accounts_fts_vocab USING fts5vocab(accounts_fts, row);
+
+    CREATE TRIGGER accounts_fts_insert AFTER INSERT ON accounts BEGIN
+        INSERT INTO accounts_fts(rowid, username, fullname)
+        VALUES (new.id, new.username, new.fullname);
+    END;
+
+    CREATE TRIGGER accounts_fts_update AFTER UPDATE OF username, fullname ON accounts BEGIN
+        INSERT INTO accounts_fts(accounts_fts, rowid, username, fullname)
+        VALUES ('delete', old.id, old.username, old.fullname);
+        INSERT INTO accounts_fts(rowid, username, fullname)
+        VALUES (new.id, new.username, new.fullname);
+    END;
+
+    CREATE TRIGGER accounts_fts_delete AFTER DELETE ON accounts BEGIN
+        INSERT INTO accounts_fts(accounts_fts, rowid, username, fullname)
+        VALUES ('delete', old.id, old.username, old.fullname);
+    END;
+    """,
+
+    # 8: case-folded username, indexed so the requested list (stored
+    #    lowercase) can be joined against followers inside SQLite
+    """
+    ALTER TABLE accounts ADD COLUMN username_key TEXT
+    GENERATED ALWAYS AS (lower(username)) VIRTUAL;
+
+    CREATE INDEX idx_accounts_username_key ON accounts(username_key);
+    """,
+
+    # 9: requested usernames are marked accepted by the followers upload
+    #    they first appear in, and each upload counts how many it accepted
+    """
+    ALTER TABLE requested ADD COLUMN accepted_at TIMESTAMP;
+    ALTER TABLE snapshots ADD COLUMN accepted_count INTEGER;
+    """,
+
+    # 10: follow intervals again, now including snapshots still stored as
+    #     full copies. Before, intervals only came from converted ones, so
+    #     uploads made before running migrate.py only tracked who they gained.
+    REBUILD_FOLLOW_INTERVALS,
+]
+
 
-async def init_db():
-    """Initialize the database with required tables."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        # Store each CSV upload as a snapshot
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS snapshots (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                guild_id INTEGER NOT NULL,
-                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                filename TEXT,
-                total_followers INTEGER DEFAULT 0,
-                total_following INTEGER DEFAULT 0,
-                snapshot_type TEXT DEFAULT 'followers'
+class ConnectionPool:
+    """
+    A fixed-size pool of long-lived aiosqlite connections.
+
+    Callers waiting for a connection are served in arrival order, so a pool
+    of size 1 doubles as a FIFO queue for the single writer connection.
+    """
+
+    def __init__(self, path: Path, size: int = DATABASE_POOL_SIZE):
+        self.path = path
+        self.size = max(1, size)
+        self._connections: list[aiosqlite.Connection] = []
+        self._idle: list[aiosqlite.Connection] = []
+        self._waiters: deque[asyncio.Future] = deque()
+
+    async def open(self):
+        """Open every connection up front so commands never pay for it."""
+        for _ in range(self.size):
+            db = await aiosqlite.connect(self.path)
+            db.row_factory = aiosqlite.Row
+            for pragma in CONNECTION_PRAGMAS:
+                await db.execute(pragma)
+            self._connections.append(db)
+            self._idle.append(db)
+
+    def _release(self, db: aiosqlite.Connection):
+        # Hand the connection straight to the longest waiter, so a caller
+        # that releases and immediately re-acquires can't jump the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(db)
+                return
+        self._idle.append(db)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrow a connection, waiting if all of them are in use."""
+        if self._idle and not self._waiters:
+            db = self._idle.pop()
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                db = await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._release(waiter.result())
+                raise
+        try:
+            yield db
+        finally:
+            # Never hand a half-finished transaction to the next caller
+            try:
+                if db.in_transaction:
+                    await db.rollback()
+            finally:
+                self._release(db)
+
+    async def close(self):
+        """Close every connection owned by the pool."""
+        connections, self._connections = self._connections, []
+        for db in connections:
+            await db.close()
+
+
+_pool: Optional[ConnectionPool] = None
+_writer: Optional[ConnectionPool] = None
+_pool_lock = asyncio.Lock()
+
+# Upload histories by (user_id, guild_id), see get_all_snapshots_for_plotting()
+_series = LRUCache(SERIES_CACHE_UPLOADS, weigh=len)
+# Bumped on every upload, so a history read while one was being saved is
+# never cached without it
+_series_generation = 0
+
+# Decoded snapshot contents by snapshot ID, see get_snapshot_records()
+_frames = LRUCache(SNAPSHOT_CACHE_BYTES, weigh=lambda frame: frame.nbytes)
+
+# Columns of a SnapshotSeries row
+SERIES_COLUMNS = "id, CAST(strftime('%s', uploaded_at) AS INTEGER), total_followers, snapshot_type"
+
+
+async def open_pool(size: Optional[int] = None) -> ConnectionPool:
+    """Open the shared read pool and the writer connection if they aren't open yet."""
+    global _pool, _writer
+    async with _pool_lock:
+        if _pool is None:
+            # The writer goes first so it can switch a new database to WAL
+            # before any reader opens it
+            writer = ConnectionPool(DATABASE_PATH, 1)
+            await writer.open()
+            async with writer.acquire() as db:
+                cursor = await db.execute("PRAGMA journal_mode = WAL")
+                await cursor.close()
+
+            pool = ConnectionPool(DATABASE_PATH, size or DATABASE_POOL_SIZE)
+            await pool.open()
+            _pool, _writer = pool, writer
+    return _pool
+
+
+async def close_db():
+    """Close the shared read pool and the writer connection."""
+    global _pool, _writer
+    async with _pool_lock:
+        if _pool is not None:
+            pool, writer, _pool, _writer = _pool, _writer, None, None
+            await pool.close()
+            await writer.close()
+            _series.clear()
+            _frames.clear()
+
+
+@asynccontextmanager
+async def connection() -> AsyncIterator[aiosqlite.Connection]:
+    """Borrow a read connection from the shared pool."""
+    pool = _pool or await open_pool()
+    async with pool.acquire() as db:
+        yield db
+
+
+@asynccontextmanager
+async def write_connection() -> AsyncIterator[aiosqlite.Connection]:
+    """Wait for the single writer connection; every write must go through it."""
+    if _writer is None:
+        await open_pool()
+    async with _writer.acquire() as db:
+        yield db
+
+
+async def init_db(pool_size: Optional[int] = None):
+    """Initialize the connection pool and the required tables."""
+    await open_pool(pool_size)
+    async with write_connection() as db:
+        cursor = await db.execute("PRAGMA user_version")
+        version = (await cursor.fetchone())[0]
+
+        # Databases from before schema versioning (or brand new ones) start
+        # from the original schema and are upgraded by MIGRATIONS below
+        if version == 0:
+            await _create_original_schema(db)
+
+        for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+            await db.executescript(
+                f"BEGIN;\n{script}\nPRAGMA user_version = {number};\nCOMMIT;"
             )
-        """)
-
-        # Store individual follower/following records per snapshot
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                snapshot_id INTEGER NOT NULL,
-                ig_user_id TEXT,
-                username TEXT NOT NULL,
-                fullname TEXT,
-                followed_by_you TEXT,
-                is_verified TEXT,
-                profile_url TEXT,
-                record_type TEXT DEFAULT 'follower',
-                FOREIGN KEY (snapshot_id) REFERENCES snapshots(id)
+
+
+async def _create_original_schema(db: aiosqlite.Connection):
+    # Store each CSV upload as a snapshot
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            filename TEXT,
+            total_followers INTEGER DEFAULT 0,
+            total_following INTEGER DEFAULT 0,
+            snapshot_type TEXT DEFAULT 'followers'
+        )
+    """)
+
+    # Store individual follower/following records per snapshot
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            snapshot_id INTEGER NOT NULL,
+            ig_user_id TEXT,
+            username TEXT NOT NULL,
+            fullname TEXT,
+            followed_by_you TEXT,
+            is_verified TEXT,
+            profile_url TEXT,
+            record_type TEXT DEFAULT 'follower',
+            FOREIGN KEY (snapshot_id) REFERENCES snapshots(id)
+        )
+    """)
+
+    # Index for faster queries
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_records_snapshot
+        ON records(snapshot_id)
+    """)
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_records_username
+        ON records(username)
+    """)
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_snapshots_user
+        ON snapshots(user_id, guild_id)
+    """)
+
+    # Table for tracking pending follow requests
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS requested (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            notes TEXT,
+            UNIQUE(user_id, guild_id, username)
+        )
+    """)
+
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_requested_user
+        ON requested(user_id, guild_id)
+    """)
+
+    await db.commit()
+
+
+def _member_counts(members: str) -> str:
+    """Aggregate query over (account_id, flags) rows: total, mutual, fans, verified."""
+    return f"""
+        SELECT COUNT(*),
+               COALESCE(SUM((flags & {FLAG_FOLLOWED_BY_YOU}) != 0), 0),
+               COALESCE(SUM((flags & {FLAG_NOT_FOLLOWED_BY_YOU}) != 0), 0),
+               COALESCE(SUM((flags & {FLAG_VERIFIED}) != 0), 0)
+        FROM ({members})
+    """
+
+
+def _records_from(members: str) -> str:
+    """
+    Turn a query yielding (account_id, flags) rows into record-shaped rows.
+
+    The columns match SnapshotFrame.record(), so callers never see the
+    packed storage format. The members are always read first: left to
+    itself, SQLite may walk every account in username order to serve an
+    ORDER BY a.username, however few members there are.
+    """
+    return f"""
+        SELECT a.ig_user_id, a.username, a.fullname,
+               CASE WHEN m.flags & {FLAG_FOLLOWED_BY_YOU} THEN 'YES'
+                    WHEN m.flags & {FLAG_NOT_FOLLOWED_BY_YOU} THEN 'NO'
+                    ELSE '' END AS followed_by_you,
+               CASE WHEN m.flags & {FLAG_VERIFIED} THEN 'YES'
+                    WHEN m.flags & {FLAG_NOT_VERIFIED} THEN 'NO'
+                    ELSE '' END AS is_verified,
+               '{PROFILE_URL_PREFIX}' || a.username AS profile_url
+        FROM ({members}) m
+        CROSS JOIN accounts a ON a.id = m.account_id
+    """
+
+
+def _frame_rows_from(members: str) -> str:
+    """Turn a query yielding (account_id, flags) rows into SnapshotFrame rows."""
+    return f"""
+        SELECT m.account_id, m.flags, a.ig_user_id, a.username, a.fullname
+        FROM ({members}) m
+        JOIN accounts a ON a.id = m.account_id
+    """
+
+
+async def _snapshot_members_query(
+    db: aiosqlite.Connection,
+    snapshot_id: int,
+    accounts: Optional[str] = None
+) -> tuple[str, dict]:
+    """
+    Build a query selecting the (account_id, flags) rows of a snapshot.
+
+    Checkpoints (and snapshots saved before delta storage existed) read
+    their rows straight from `records`. Other snapshots start from their
+    checkpoint and take, for every account touched in between, the most
+    recent delta row. `accounts` is an optional subquery of account IDs to
+    restrict the rows to; its parameters are up to the caller.
+    """
+    only = f"AND account_id IN ({accounts})" if accounts else ""
+    cursor = await db.execute(
+        "SELECT COALESCE(checkpoint_id, id) FROM snapshots WHERE id = ?",
+        (snapshot_id,)
+    )
+    row = await cursor.fetchone()
+    checkpoint_id = row[0] if row else snapshot_id
+    params = {"checkpoint_id": checkpoint_id, "snapshot_id": snapshot_id}
+
+    if checkpoint_id == snapshot_id:
+        return (
+            f"SELECT account_id, flags FROM records WHERE snapshot_id = :snapshot_id {only}",
+            params
+        )
+
+    chain = """
+        SELECT id FROM snapshots
+        WHERE checkpoint_id = :checkpoint_id
+          AND id > :checkpoint_id AND id <= :snapshot_id
+    """
+    query = f"""
+        SELECT account_id, flags FROM records
+        WHERE snapshot_id = :checkpoint_id {only}
+          AND account_id NOT IN (
+              SELECT account_id FROM record_deltas WHERE snapshot_id IN ({chain})
+          )
+        UNION ALL
+        SELECT account_id, flags FROM (
+            SELECT account_id, flags, change, MAX(snapshot_id)
+            FROM record_deltas
+            WHERE snapshot_id IN ({chain}) {only}
+            GROUP BY account_id
+        )
+        WHERE change != {DELTA_REMOVED}
+    """
+    return query, params
+
+
+async def _create_members_table(db: aiosqlite.Connection, name: str):
+    await db.execute(f"""
+        CREATE TEMP TABLE {name} (
+            account_id INTEGER PRIMARY KEY,
+            flags INTEGER NOT NULL
+        )
+    """)
+
+
+async def _in_batches(records: SnapshotFrame) -> AsyncIterator[SnapshotFrame]:
+    for start in range(0, len(records), INGEST_BATCH_SIZE):
+        yield records[start:start + INGEST_BATCH_SIZE]
+
+
+async def _stage_records(
+    db: aiosqlite.Connection,
+    chunks: AsyncIterable[SnapshotFrame]
+):
+    """
+    Load export rows into temp.staged_members as (account_id, flags).
+
+    Rows are sent in batches of INGEST_BATCH_SIZE; unseen usernames are
+    added to `accounts` and known ones get their current Instagram ID and
+    full name. Accounts are keyed by username, so an account that was
+    renamed shows up as a new one. Each
+    batch is resolved to account ids before the next one is sent, so only
+    the compact staged_members table grows with the size of the export.
+    """
+    await db.execute("""
+        CREATE TEMP TABLE staged_records (
+            username TEXT,
+            ig_user_id TEXT,
+            fullname TEXT,
+            flags INTEGER
+        )
+    """)
+    await _create_members_table(db, "staged_members")
+
+    async for chunk in chunks:
+        for start in range(0, len(chunk), INGEST_BATCH_SIZE):
+            await _stage_batch(db, chunk[start:start + INGEST_BATCH_SIZE])
+
+    await db.execute("DROP TABLE temp.staged_records")
+
+
+async def _stage_batch(db: aiosqlite.Connection, batch: SnapshotFrame):
+    await db.executemany(
+        """
+        INSERT INTO staged_records (username, ig_user_id, fullname, flags)
+        VALUES (?, ?, ?, ?)
+        """,
+        zip(batch.usernames, batch.ig_user_ids, batch.fullnames, batch.flags)
+    )
+
+    await db.execute("""
+        INSERT INTO accounts (username, ig_user_id, fullname)
+        SELECT username, ig_user_id, fullname FROM staged_records WHERE true
+        ON CONFLICT(username) DO UPDATE SET
+            ig_user_id = excluded.ig_user_id,
+            fullname = excluded.fullname
+        WHERE ig_user_id IS NOT excluded.ig_user_id
+           OR fullname IS NOT excluded.fullname
+    """)
+
+    await db.execute("""
+        INSERT OR IGNORE INTO staged_members (account_id, flags)
+        SELECT a.id, s.flags
+        FROM staged_records s
+        JOIN accounts a ON a.username = s.username
+    """)
+    await db.execute("DELETE FROM staged_records")
+
+
+async def _store_staged_snapshot(
+    db: aiosqlite.Connection,
+    snapshot_id: int,
+    parent_id: Optional[int]
+):
+    """
+    Persist the rows in temp.staged_members as the contents of a snapshot.
+
+    Rows that differ from the parent snapshot are always written to
+    `record_deltas`, which makes diffs between consecutive uploads cheap.
+    The full row set is only written to `records` when the snapshot becomes
+    a new checkpoint. Summary counts are stored on the snapshot row so
+    dashboards never need to scan the records. Runs inside the caller's
+    transaction and drops the staging table when done.
+    """
+    cursor = await db.execute(_member_counts("SELECT flags FROM staged_members"))
+    staged_count, mutual_count, fan_count, verified_count = await cursor.fetchone()
+
+    checkpoint_id = snapshot_id
+    gained_count = lost_count = net_change = None
+    if parent_id is not None:
+        parent_query, params = await _snapshot_members_query(db, parent_id)
+        await _create_members_table(db, "parent_members")
+        await db.execute(f"INSERT INTO parent_members {parent_query}", params)
+
+        params = {"snapshot_id": snapshot_id}
+        cursor = await db.execute(f"""
+            INSERT INTO record_deltas (snapshot_id, account_id, change, flags)
+            SELECT :snapshot_id, s.account_id, {DELTA_ADDED}, s.flags
+            FROM staged_members s
+            WHERE s.account_id NOT IN (SELECT account_id FROM parent_members)
+        """, params)
+        gained_count = cursor.rowcount
+
+        cursor = await db.execute(f"""
+            INSERT INTO record_deltas (snapshot_id, account_id, change, flags)
+            SELECT :snapshot_id, p.account_id, {DELTA_REMOVED}, p.flags
+            FROM parent_members p
+            WHERE p.account_id NOT IN (SELECT account_id FROM staged_members)
+        """, params)
+        lost_count = cursor.rowcount
+
+        cursor = await db.execute(f"""
+            INSERT INTO record_deltas (snapshot_id, account_id, change, flags)
+            SELECT :snapshot_id, s.account_id, {DELTA_UPDATED}, s.flags
+            FROM staged_members s
+            JOIN parent_members p ON p.account_id = s.account_id
+            WHERE s.flags != p.flags
+        """, params)
+        delta_count = gained_count + lost_count + cursor.rowcount
+
+        await db.execute("DROP TABLE temp.parent_members")
+
+        # Log who was gained or lost so change views never rebuild snapshots
+        await db.execute(f"""
+            INSERT INTO changes (
+                snapshot_id, account_id, user_id, guild_id,
+                snapshot_type, change, flags, changed_at
             )
-        """)
-
-        # Index for faster queries
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_records_snapshot
-            ON records(snapshot_id)
-        """)
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_records_username
-            ON records(username)
-        """)
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_snapshots_user
-            ON snapshots(user_id, guild_id)
-        """)
-
-        # Table for tracking pending follow requests
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS requested (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                guild_id INTEGER NOT NULL,
-                username TEXT NOT NULL,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                notes TEXT,
-                UNIQUE(user_id, guild_id, username)
+            SELECT d.snapshot_id, d.account_id, s.user_id, s.guild_id,
+                   s.snapshot_type, d.change, d.flags, s.uploaded_at
+            FROM record_deltas d
+            JOIN snapshots s ON s.id = d.snapshot_id
+            WHERE d.snapshot_id = :snapshot_id AND d.change != {DELTA_UPDATED}
+        """, params)
+
+        cursor = await db.execute(
+            """
+            SELECT p.checkpoint_id,
+                   (SELECT COUNT(*) FROM snapshots c
+                    WHERE c.checkpoint_id = p.checkpoint_id
+                      AND c.id > p.checkpoint_id),
+                   p.total_followers,
+                   EXISTS (SELECT 1 FROM snapshots c
+                           WHERE c.checkpoint_id = :snapshot_id AND c.id != :snapshot_id)
+            FROM snapshots p WHERE p.id = :parent_id
+            """,
+            {"snapshot_id": snapshot_id, "parent_id": parent_id}
+        )
+        parent_checkpoint_id, chain_length, parent_total, has_chain = await cursor.fetchone()
+        net_change = staged_count - parent_total
+
+        # Start a new checkpoint when the delta chain gets long, or when the
+        # delta would be about as large as a full copy anyway. Snapshots
+        # saved before delta storage existed have no checkpoint yet and are
+        # never chained onto, as compact_snapshots() may still turn them
+        # into deltas; when it does, any it finds chained onto anyway (by
+        # older versions of this code) keep their records as checkpoints.
+        if (
+            parent_checkpoint_id is not None
+            and not has_chain
+            and chain_length + 1 < SNAPSHOT_CHECKPOINT_INTERVAL
+            and delta_count * 2 <= staged_count
+        ):
+            checkpoint_id = parent_checkpoint_id
+
+    if checkpoint_id == snapshot_id:
+        await db.execute(
+            """
+            INSERT INTO records (snapshot_id, account_id, flags)
+            SELECT ?, account_id, flags FROM staged_members
+            """,
+            (snapshot_id,)
+        )
+
+    await db.execute(
+        """
+        UPDATE snapshots SET
+            parent_id = ?,
+            checkpoint_id = ?,
+            total_followers = ?,
+            total_following = CASE snapshot_type WHEN 'following' THEN ? ELSE 0 END,
+            mutual_count = ?,
+            fan_count = ?,
+            verified_count = ?,
+            gained_count = ?,
+            lost_count = ?,
+            net_change = ?
+        WHERE id = ?
+        """,
+        (
+            parent_id, checkpoint_id, staged_count, staged_count,
+            mutual_count, fan_count, verified_count,
+            gained_count, lost_count, net_change,
+            snapshot_id
+        )
+    )
+    await db.execute("DROP TABLE temp.staged_members")
+
+
+async def _update_follow_intervals(
+    db: aiosqlite.Connection,
+    snapshot_id: int,
+    parent_id: Optional[int]
+):
+    """
+    Bring follow_intervals up to date with a new upload.
+
+    Opens an interval for every account it gained and closes the open
+    interval of every one it lost; unchanged accounts are not touched.
+    Runs inside the caller's transaction, after _store_staged_snapshot().
+    compact_snapshots() doesn't call it: converting a snapshot leaves its
+    intervals as they were.
+    """
+    if parent_id is None:
+        # First upload of the series, always a checkpoint: everyone in it
+        # starts an interval
+        await db.execute(
+            """
+            INSERT INTO follow_intervals (
+                user_id, guild_id, snapshot_type, account_id, first_seen_snapshot_id
             )
-        """)
+            SELECT s.user_id, s.guild_id, s.snapshot_type, r.account_id, s.id
+            FROM records r
+            JOIN snapshots s ON s.id = r.snapshot_id
+            WHERE r.snapshot_id = ?
+            """,
+            (snapshot_id,)
+        )
+        return
 
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_requested_user
-            ON requested(user_id, guild_id)
-        """)
+    params = {"snapshot_id": snapshot_id, "parent_id": parent_id}
+    await db.execute(f"""
+        INSERT INTO follow_intervals (
+            user_id, guild_id, snapshot_type, account_id, first_seen_snapshot_id
+        )
+        SELECT user_id, guild_id, snapshot_type, account_id, snapshot_id
+        FROM changes
+        WHERE snapshot_id = :snapshot_id AND change = {DELTA_ADDED}
+    """, params)
+    await db.execute(f"""
+        UPDATE follow_intervals
+        SET last_seen_snapshot_id = :parent_id
+        WHERE last_seen_snapshot_id IS NULL
+          AND (user_id, guild_id, snapshot_type, account_id) IN (
+              SELECT user_id, guild_id, snapshot_type, account_id
+              FROM changes
+              WHERE snapshot_id = :snapshot_id AND change = {DELTA_REMOVED}
+          )
+    """, params)
 
-        await db.commit()
+
+def _follows_now(requested: str) -> str:
+    """SQL condition: the `requested` row's username is a current follower."""
+    return f"""
+        EXISTS (
+            SELECT 1 FROM accounts a
+            WHERE a.username_key = {requested}.username
+              AND EXISTS (
+                  SELECT 1 FROM follow_intervals i
+                  WHERE i.user_id = {requested}.user_id
+                    AND i.guild_id = {requested}.guild_id
+                    AND i.snapshot_type = 'followers'
+                    AND i.account_id = a.id
+                    AND i.last_seen_snapshot_id IS NULL
+              )
+        )
+    """
+
+
+async def _reconcile_requested(
+    db: aiosqlite.Connection,
+    user_id: int,
+    guild_id: int,
+    snapshot_id: int
+):
+    """
+    Mark requested usernames that follow back as of a new followers upload.
+
+    Only the user's still-pending requested rows are looked at, each with
+    an index lookup, and they're stamped with the upload's time. The number
+    accepted is stored on the snapshot. Runs inside the caller's transaction.
+    """
+    cursor = await db.execute(
+        f"""
+        UPDATE requested
+        SET accepted_at = (SELECT uploaded_at FROM snapshots WHERE id = :snapshot_id)
+        WHERE user_id = :user_id AND guild_id = :guild_id
+          AND accepted_at IS NULL
+          AND {_follows_now("requested")}
+        """,
+        {"snapshot_id": snapshot_id, "user_id": user_id, "guild_id": guild_id}
+    )
+    await db.execute(
+        "UPDATE snapshots SET accepted_count = ? WHERE id = ?",
+        (cursor.rowcount, snapshot_id)
+    )
 
 
 async def save_snapshot(
     user_id: int,
     guild_id: int,
     filename: str,
-    records: list[dict],
+    records: SnapshotFrame | AsyncIterable[SnapshotFrame],
     snapshot_type: str = "followers"
 ) -> int:
-    """Save a new snapshot and return its ID."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    """
+    Save a new snapshot and return its ID.
+
+    Records are staged in batches of INGEST_BATCH_SIZE rows inside a single
+    transaction, so a large export costs a handful of round-trips to the
+    aiosqlite worker thread instead of one per row. Only the rows that
+    changed since the previous upload are stored, except on checkpoints.
+    A followers upload also marks accepted requested usernames in the
+    same transaction.
+
+    `records` may also be an async iterable of frames, e.g. chunks parsed
+    from a file while it is being saved, so the whole export never has to
+    be held in memory.
+    """
+    if isinstance(records, SnapshotFrame):
+        records = _in_batches(records)
+
+    async with write_connection() as db:
+        await db.execute("BEGIN IMMEDIATE")
+
+        cursor = await db.execute(
+            """
+            SELECT id FROM snapshots
+            WHERE user_id = ? AND guild_id = ? AND snapshot_type = ?
+            ORDER BY uploaded_at DESC, id DESC
+            LIMIT 1
+            """,
+            (user_id, guild_id, snapshot_type)
+        )
+        parent = await cursor.fetchone()
+
+        # The totals are filled in once every row has been staged
         cursor = await db.execute(
             """
             INSERT INTO snapshots (user_id, guild_id, filename, total_followers, snapshot_type)
-            VALUES (?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, 0, ?)
             """,
-            (user_id, guild_id, filename, len(records), snapshot_type)
+            (user_id, guild_id, filename, snapshot_type)
         )
         snapshot_id = cursor.lastrowid
 
-        # Insert all records
-        for record in records:
+        parent_id = parent["id"] if parent else None
+        await _stage_records(db, records)
+        await _store_staged_snapshot(db, snapshot_id, parent_id)
+        await _update_follow_intervals(db, snapshot_id, parent_id)
+        if snapshot_type == "followers":
+            await _reconcile_requested(db, user_id, guild_id, snapshot_id)
+
+        cursor = await db.execute(
+            f"SELECT {SERIES_COLUMNS} FROM snapshots WHERE id = ?", (snapshot_id,)
+        )
+        row = await cursor.fetchone()
+
+        await db.commit()
+        _add_to_series(user_id, guild_id, tuple(row))
+        return snapshot_id
+
+
+def _add_to_series(user_id: int, guild_id: int, row: tuple):
+    """Add a committed upload to the user's cached history, if it is cached."""
+    global _series_generation
+    _series_generation += 1
+    series = _series.pop((user_id, guild_id))
+    if series is not None:
+        series.add(*row)
+        # Put back so its new length counts against the budget
+        _series.put((user_id, guild_id), series)
+
+
+async def compact_snapshots(progress=None) -> int:
+    """
+    Convert snapshots stored as full copies into checkpoints and deltas.
+
+    Used to migrate databases created before delta storage existed. Each
+    snapshot is converted in its own transaction, oldest first, so the tool
+    can be interrupted and re-run safely.
+
+    Args:
+        progress: Optional callable receiving (done, total) after each snapshot
+
+    Returns:
+        Number of snapshots converted
+    """
+    async with write_connection() as db:
+        cursor = await db.execute(
+            """
+            SELECT s.id,
+                   (SELECT MAX(p.id) FROM snapshots p
+                    WHERE p.user_id = s.user_id AND p.guild_id = s.guild_id
+                      AND p.snapshot_type = s.snapshot_type AND p.id < s.id) AS parent_id
+            FROM snapshots s
+            WHERE s.checkpoint_id IS NULL
+            ORDER BY s.id
+            """
+        )
+        legacy = await cursor.fetchall()
+
+        for done, row in enumerate(legacy, start=1):
+            await db.execute("BEGIN IMMEDIATE")
+            await _create_members_table(db, "staged_members")
             await db.execute(
                 """
-                INSERT INTO records (
-                    snapshot_id, ig_user_id, username, fullname,
-                    followed_by_you, is_verified, profile_url, record_type
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO staged_members (account_id, flags)
+                SELECT account_id, flags FROM records WHERE snapshot_id = ?
                 """,
-                (
-                    snapshot_id,
-                    record.get("user_id", ""),
-                    record.get("username", ""),
-                    record.get("fullname", ""),
-                    record.get("followed_by_you", ""),
-                    record.get("is_verified", ""),
-                    record.get("profile_url", ""),
-                    snapshot_type
-                )
+                (row["id"],)
             )
+            await db.execute("DELETE FROM records WHERE snapshot_id = ?", (row["id"],))
+            await _store_staged_snapshot(db, row["id"], row["parent_id"])
+            await db.commit()
 
-        await db.commit()
-        return snapshot_id
+            if progress:
+                progress(done, len(legacy))
+
+    return len(legacy)
+
+
+async def _backfill_stats(db: aiosqlite.Connection, snapshot_id: int):
+    """Compute the stored summary counts for a snapshot saved without them."""
+    members, params = await _snapshot_members_query(db, snapshot_id)
+    cursor = await db.execute(_member_counts(members), params)
+    total, mutual_count, fan_count, verified_count = await cursor.fetchone()
+
+    gained_count = lost_count = net_change = None
+    cursor = await db.execute(
+        f"""
+        SELECT p.total_followers,
+               (SELECT COUNT(*) FROM record_deltas
+                WHERE snapshot_id = s.id AND change = {DELTA_ADDED}),
+               (SELECT COUNT(*) FROM record_deltas
+                WHERE snapshot_id = s.id AND change = {DELTA_REMOVED})
+        FROM snapshots s JOIN snapshots p ON p.id = s.parent_id
+        WHERE s.id = ?
+        """,
+        (snapshot_id,)
+    )
+    row = await cursor.fetchone()
+    if row:
+        parent_total, gained_count, lost_count = row
+        net_change = total - parent_total
+
+    await db.execute(
+        """
+        UPDATE snapshots SET
+            mutual_count = ?,
+            fan_count = ?,
+            verified_count = ?,
+            gained_count = ?,
+            lost_count = ?,
+            net_change = ?
+        WHERE id = ?
+        """,
+        (mutual_count, fan_count, verified_count,
+         gained_count, lost_count, net_change, snapshot_id)
+    )
+    await db.commit()
+
+
+async def backfill_snapshot_stats(progress=None) -> int:
+    """
+    Fill in summary counts for snapshots saved before they were stored.
+
+    Args:
+        progress: Optional callable receiving (done, total) after each snapshot
+
+    Returns:
+        Number of snapshots updated
+    """
+    async with write_connection() as db:
+        cursor = await db.execute(
+            "SELECT id FROM snapshots WHERE mutual_count IS NULL ORDER BY id"
+        )
+        missing = [row["id"] for row in await cursor.fetchall()]
+
+        for done, snapshot_id in enumerate(missing, start=1):
+            await _backfill_stats(db, snapshot_id)
+            if progress:
+                progress(done, len(missing))
+
+    return len(missing)
 
 
 async def get_snapshots(user_id: int, guild_id: int, limit: int = 10) -> list[dict]:
     """Get recent snapshots for a user."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with connection() as db:
         cursor = await db.execute(
             """
             SELECT * FROM snapshots
             WHERE user_id = ? AND guild_id = ?
-            ORDER BY uploaded_at DESC
+            ORDER BY uploaded_at DESC, id DESC
             LIMIT ?
             """,
             (user_id, guild_id, limit)
@@ -138,18 +1178,56 @@ async def get_snapshots(user_id: int, guild_id: int, limit: int = 10) -> list[di
         return [dict(row) for row in rows]
 
 
-async def get_snapshot_records(snapshot_id: int) -> list[dict]:
-    """Get all records for a snapshot."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            """
-            SELECT * FROM records WHERE snapshot_id = ?
-            """,
-            (snapshot_id,)
-        )
+async def get_snapshot(snapshot_id: int) -> Optional[dict]:
+    """Get a single snapshot row, including its summary counts."""
+    async with connection() as db:
+        cursor = await db.execute("SELECT * FROM snapshots WHERE id = ?", (snapshot_id,))
+        row = await cursor.fetchone()
+        return dict(row) if row else None
+
+
+async def get_snapshot_records(snapshot_id: int) -> SnapshotFrame:
+    """
+    Get all records for a snapshot, rebuilding it from deltas if needed.
+
+    Snapshots don't change once saved, so each one is decoded once and
+    then kept in memory, up to SNAPSHOT_CACHE_BYTES. Account details
+    (name, Instagram ID) are those current when it was first decoded. The
+    frame is shared with other callers; it is never changed.
+    """
+    frame = _frames.get(snapshot_id)
+    if frame is not None:
+        return frame
+
+    async with connection() as db:
+        # One read transaction, so the members are read from the same state
+        # of the database the snapshot was found in
+        await db.execute("BEGIN")
+        cursor = await db.execute("SELECT 1 FROM snapshots WHERE id = ?", (snapshot_id,))
+        if await cursor.fetchone() is None:
+            # An unknown ID might still be saved later, so it isn't cached
+            await db.commit()
+            return SnapshotFrame()
+        members, params = await _snapshot_members_query(db, snapshot_id)
+        cursor = await db.execute(_frame_rows_from(members), params)
         rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+        await db.commit()
+    # Building (and measuring) a large frame takes seconds of CPU, so it
+    # happens off the event loop
+    frame = await asyncio.to_thread(_decode_frame, rows)
+    _frames.put(snapshot_id, frame)
+    return frame
+
+
+def _decode_frame(rows: list) -> SnapshotFrame:
+    frame = SnapshotFrame.from_rows(rows)
+    frame.nbytes  # measured once here, so _frames.put() doesn't on the loop
+    return frame
+
+
+def snapshot_cache_stats() -> dict:
+    """Hit/miss/eviction counters of the decoded snapshot cache."""
+    return _frames.stats()
 
 
 async def get_latest_snapshot(
@@ -157,72 +1235,635 @@ async def get_latest_snapshot(
     guild_id: int,
     snapshot_type: str = "followers"
 ) -> Optional[dict]:
-    """Get the most recent snapshot of a specific type."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    """
+    Get the most recent snapshot of a specific type.
+
+    The row includes the summary counts (mutual_count, fan_count,
+    verified_count and gained/lost/net since the previous upload), so
+    callers don't need to load its records just to count them.
+    """
+    async with connection() as db:
+        query = """
+            SELECT * FROM snapshots
+            WHERE user_id = ? AND guild_id = ? AND snapshot_type = ?
+            ORDER BY uploaded_at DESC, id DESC
+            LIMIT 1
+        """
+        params = (user_id, guild_id, snapshot_type)
+        cursor = await db.execute(query, params)
+        row = await cursor.fetchone()
+
+        if row and row["mutual_count"] is None:
+            async with write_connection() as writer:
+                await _backfill_stats(writer, row["id"])
+                cursor = await writer.execute(query, params)
+                row = await cursor.fetchone()
+
+        return dict(row) if row else None
+
+
+async def get_all_snapshots_for_plotting(
+    user_id: int,
+    guild_id: int,
+    snapshot_type: Optional[str] = None
+) -> list[dict]:
+    """
+    Get all snapshots for plotting trends, oldest first.
+
+    A user's history is read from the database once and then served from
+    memory; save_snapshot() adds each new upload to it as it commits.
+
+    Args:
+        snapshot_type: Only return uploads of this type (default: all)
+
+    Returns:
+        list of dicts with 'id', 'uploaded_at', 'total_followers' and 'snapshot_type'
+    """
+    key = (user_id, guild_id)
+    series = _series.get(key)
+    if series is None:
+        generation = _series_generation
+        async with connection() as db:
+            cursor = await db.execute(
+                f"""
+                SELECT {SERIES_COLUMNS}
+                FROM snapshots
+                WHERE user_id = ? AND guild_id = ?
+                ORDER BY uploaded_at ASC, id ASC
+                """,
+                (user_id, guild_id)
+            )
+            series = SnapshotSeries.from_rows(await cursor.fetchall())
+        if generation == _series_generation:
+            _series.put(key, series)
+    return series.to_dicts(snapshot_type)
+
+
+def series_cache_stats() -> dict:
+    """Hit/miss/eviction counters of the upload history cache."""
+    return _series.stats()
+
+
+async def _page(
+    db: aiosqlite.Connection,
+    members: str,
+    params: tuple,
+    limit: Optional[int],
+    offset: int
+) -> tuple[list[dict], int]:
+    """Count the (account_id, flags) rows of `members` and fetch one page of records."""
+    cursor = await db.execute(f"SELECT COUNT(*) FROM ({members})", params)
+    count = (await cursor.fetchone())[0]
+
+    rows = []
+    if count and limit != 0:
+        cursor = await db.execute(
+            f"{_records_from(members)} ORDER BY a.username LIMIT ? OFFSET ?",
+            params + (-1 if limit is None else limit, offset)
+        )
+        rows = [dict(row) for row in await cursor.fetchall()]
+
+    return rows, count
+
+
+def _frame_page(
+    frame: SnapshotFrame,
+    indices: list[int],
+    limit: Optional[int],
+    offset: int
+) -> tuple[list[dict], int]:
+    """Like _page(), for records of a cached snapshot."""
+    end = None if limit is None else offset + limit
+    return [frame.record(index) for index in indices[offset:end]], len(indices)
+
+
+def _frame_diff(
+    old: SnapshotFrame,
+    new: SnapshotFrame,
+    limit: Optional[int],
+    offset: int
+) -> tuple[tuple[list[dict], int], tuple[list[dict], int]]:
+    """Pages of gained and lost records between two cached snapshots."""
+    return (
+        _frame_page(new, new.missing_from(old), limit, offset),
+        _frame_page(old, old.missing_from(new), limit, offset)
+    )
+
+
+def _missing_from(table: str, other: str) -> str:
+    """Anti-join selecting members of `table` that aren't in `other`."""
+    return f"""
+        SELECT account_id, flags FROM {table}
+        WHERE account_id NOT IN (SELECT account_id FROM {other})
+    """
+
+
+def _logged_changes(change: int) -> str:
+    return f"""
+        SELECT account_id, flags FROM changes
+        WHERE snapshot_id = ? AND change = {change}
+    """
+
+
+async def compare_snapshots(
+    old_snapshot_id: int,
+    new_snapshot_id: int,
+    limit: Optional[int] = None,
+    offset: int = 0
+) -> dict:
+    """
+    Compare two snapshots and return differences.
+
+    The diff runs inside SQLite, so only the gained/lost rows that are asked
+    for are loaded. `limit` and `offset` page through each list (ordered by
+    username); the counts always cover the full difference. Consecutive
+    uploads are answered straight from the change log.
+    """
+    async with connection() as db:
+        cursor = await db.execute(
+            "SELECT id, parent_id, total_followers FROM snapshots WHERE id IN (?, ?)",
+            (old_snapshot_id, new_snapshot_id)
+        )
+        snapshots = {row["id"]: row for row in await cursor.fetchall()}
+        old = snapshots.get(old_snapshot_id)
+        new = snapshots.get(new_snapshot_id)
+        old_total = old["total_followers"] if old else 0
+        new_total = new["total_followers"] if new else 0
+
+        if new and new["parent_id"] == old_snapshot_id:
+            params = (new_snapshot_id,)
+            gained = await _page(db, _logged_changes(DELTA_ADDED), params, limit, offset)
+            lost = await _page(db, _logged_changes(DELTA_REMOVED), params, limit, offset)
+        elif old and old["parent_id"] == new_snapshot_id:
+            params = (old_snapshot_id,)
+            gained = await _page(db, _logged_changes(DELTA_REMOVED), params, limit, offset)
+            lost = await _page(db, _logged_changes(DELTA_ADDED), params, limit, offset)
+        elif old_snapshot_id in _frames and new_snapshot_id in _frames:
+            # Both sides are already decoded in memory; diffing them is
+            # CPU-bound, so it happens off the event loop
+            gained, lost = await asyncio.to_thread(
+                _frame_diff,
+                _frames.get(old_snapshot_id), _frames.get(new_snapshot_id),
+                limit, offset
+            )
+        else:
+            # Rebuild both sides in temp tables and anti-join them
+            sides = (("diff_old", old_snapshot_id), ("diff_new", new_snapshot_id))
+            try:
+                for table, snapshot_id in sides:
+                    members, params = await _snapshot_members_query(db, snapshot_id)
+                    await _create_members_table(db, table)
+                    await db.execute(f"INSERT INTO {table} {members}", params)
+                await db.commit()
+
+                gained = await _page(db, _missing_from("diff_new", "diff_old"), (), limit, offset)
+                lost = await _page(db, _missing_from("diff_old", "diff_new"), (), limit, offset)
+            finally:
+                if db.in_transaction:
+                    await db.rollback()
+                for table, _ in sides:
+                    await db.execute(f"DROP TABLE IF EXISTS temp.{table}")
+
+    return {
+        "gained": gained[0],
+        "lost": lost[0],
+        "gained_count": gained[1],
+        "lost_count": lost[1],
+        "old_total": old_total,
+        "new_total": new_total,
+        "net_change": new_total - old_total
+    }
+
+
+async def get_recent_changes(
+    user_id: int,
+    guild_id: int,
+    snapshot_type: str = "followers",
+    days: int = 30,
+    limit: Optional[int] = None,
+    offset: int = 0
+) -> dict:
+    """
+    Collect every gain and loss logged in the last `days` days.
+
+    Reads only the change log, so the cost depends on how many accounts
+    changed rather than on the size of the snapshots. Returns the same keys
+    as compare_snapshots. Each account is listed once, on the side of its
+    net change over the window, with its latest flags; one that came and
+    went (or left and came back) isn't listed, so the counts add up to
+    net_change.
+    """
+    window = """
+        SELECT account_id, flags FROM (
+            SELECT account_id, flags, MAX(snapshot_id), SUM(change) AS net_change
+            FROM changes
+            WHERE user_id = ? AND guild_id = ? AND snapshot_type = ?
+              AND changed_at >= datetime('now', ?)
+            GROUP BY account_id
+        )
+        WHERE net_change = ?
+    """
+    params = (user_id, guild_id, snapshot_type, f"-{days} days")
+
+    async with connection() as db:
+        gained = await _page(db, window, params + (DELTA_ADDED,), limit, offset)
+        lost = await _page(db, window, params + (DELTA_REMOVED,), limit, offset)
+
         cursor = await db.execute(
             """
-            SELECT * FROM snapshots
+            SELECT total_followers FROM snapshots
             WHERE user_id = ? AND guild_id = ? AND snapshot_type = ?
-            ORDER BY uploaded_at DESC
+            ORDER BY uploaded_at DESC, id DESC
             LIMIT 1
             """,
             (user_id, guild_id, snapshot_type)
         )
         row = await cursor.fetchone()
-        return dict(row) if row else None
 
+    new_total = row[0] if row else 0
+    net_change = gained[1] - lost[1]
+    return {
+        "gained": gained[0],
+        "lost": lost[0],
+        "gained_count": gained[1],
+        "lost_count": lost[1],
+        "old_total": new_total - net_change,
+        "new_total": new_total,
+        "net_change": net_change
+    }
 
-async def get_all_snapshots_for_plotting(
+
+def _is_first_upload(snapshot: str) -> str:
+    """
+    SQL condition: the `snapshot` row is the first upload of its series.
+
+    Not the same as having no parent_id: snapshots saved before delta
+    storage existed have none until compact_snapshots() converts them.
+    """
+    return f"""
+        NOT EXISTS (
+            SELECT 1 FROM snapshots p
+            WHERE p.user_id = {snapshot}.user_id
+              AND p.guild_id = {snapshot}.guild_id
+              AND p.snapshot_type = {snapshot}.snapshot_type
+              AND p.id < {snapshot}.id
+        )
+    """
+
+
+async def get_follow_history(
     user_id: int,
-    guild_id: int
+    guild_id: int,
+    username: str
 ) -> list[dict]:
-    """Get all snapshots for plotting trends."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    """
+    Get every follow episode of one account, oldest first.
+
+    Returns:
+        List of dicts with 'snapshot_type', 'first_seen_at', 'last_seen_at'
+        (None while the account is still in the latest upload) and
+        'since_first_upload' (True when the account was already there on the
+        first upload, so the real start date is unknown)
+    """
+    async with connection() as db:
         cursor = await db.execute(
-            """
-            SELECT id, uploaded_at, total_followers, snapshot_type
-            FROM snapshots
-            WHERE user_id = ? AND guild_id = ?
-            ORDER BY uploaded_at ASC
+            f"""
+            SELECT i.snapshot_type,
+                   f.uploaded_at AS first_seen_at,
+                   l.uploaded_at AS last_seen_at,
+                   {_is_first_upload("f")} AS since_first_upload
+            FROM accounts a
+            JOIN follow_intervals i ON i.account_id = a.id
+            JOIN snapshots f ON f.id = i.first_seen_snapshot_id
+            LEFT JOIN snapshots l ON l.id = i.last_seen_snapshot_id
+            WHERE a.username = ? AND i.user_id = ? AND i.guild_id = ?
+            ORDER BY i.first_seen_snapshot_id
             """,
-            (user_id, guild_id)
+            (username.strip().lstrip('@').lower(), user_id, guild_id)
         )
         rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+        return [
+            {**dict(row), "since_first_upload": bool(row["since_first_upload"])}
+            for row in rows
+        ]
+
+
+async def get_follow_tenure(
+    user_id: int,
+    guild_id: int,
+    usernames: list[str],
+    snapshot_type: str = "followers"
+) -> dict[str, dict]:
+    """
+    Look up when each account's current follow episode started.
 
+    Returns:
+        Dict mapping username to {'first_seen_at', 'since_first_upload'} for
+        the accounts that are in the latest upload
+    """
+    if not usernames:
+        return {}
 
-async def compare_snapshots(old_snapshot_id: int, new_snapshot_id: int) -> dict:
-    """Compare two snapshots and return differences."""
-    old_records = await get_snapshot_records(old_snapshot_id)
-    new_records = await get_snapshot_records(new_snapshot_id)
+    placeholders = ", ".join("?" for _ in usernames)
+    async with connection() as db:
+        cursor = await db.execute(
+            f"""
+            SELECT a.username,
+                   f.uploaded_at AS first_seen_at,
+                   {_is_first_upload("f")} AS since_first_upload
+            FROM accounts a
+            JOIN follow_intervals i ON i.account_id = a.id
+            JOIN snapshots f ON f.id = i.first_seen_snapshot_id
+            WHERE a.username IN ({placeholders})
+              AND i.user_id = ? AND i.guild_id = ? AND i.snapshot_type = ?
+              AND i.last_seen_snapshot_id IS NULL
+            """,
+            (*usernames, user_id, guild_id, snapshot_type)
+        )
+        rows = await cursor.fetchall()
+        return {
+            row["username"]: {
+                "first_seen_at": row["first_seen_at"],
+                "since_first_upload": bool(row["since_first_upload"])
+            }
+            for row in rows
+        }
 
-    old_usernames = {r["username"] for r in old_records}
-    new_usernames = {r["username"] for r in new_records}
 
-    gained = new_usernames - old_usernames
-    lost = old_usernames - new_usernames
+async def get_current_usernames(
+    user_id: int,
+    guild_id: int,
+    snapshot_type: str = "followers"
+) -> list[str]:
+    """Get the usernames in the latest upload of `snapshot_type`, in no particular order."""
+    async with connection() as db:
+        cursor = await db.execute(
+            """
+            SELECT a.username
+            FROM follow_intervals i
+            JOIN accounts a ON a.id = i.account_id
+            WHERE i.user_id = ? AND i.guild_id = ? AND i.snapshot_type = ?
+              AND i.last_seen_snapshot_id IS NULL
+            """,
+            (user_id, guild_id, snapshot_type)
+        )
+        return [row[0] for row in await cursor.fetchall()]
 
-    # Get full details for gained/lost
-    gained_details = [r for r in new_records if r["username"] in gained]
-    lost_details = [r for r in old_records if r["username"] in lost]
 
-    return {
-        "gained": gained_details,
-        "lost": lost_details,
-        "gained_count": len(gained),
-        "lost_count": len(lost),
-        "old_total": len(old_records),
-        "new_total": len(new_records),
-        "net_change": len(new_records) - len(old_records)
+# ============================================================================
+# ACCOUNT SEARCH
+# ============================================================================
+
+def _fts_phrase(text: str) -> str:
+    """Quote text as a single FTS5 phrase, i.e. a plain substring for trigrams."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _search_intervals(snapshot_id: Optional[int]) -> str:
+    """Condition limiting follow_intervals `i` to one snapshot, or to a whole series."""
+    condition = """
+        i.user_id = :user_id AND i.guild_id = :guild_id
+        AND i.snapshot_type = :snapshot_type
+    """
+    if snapshot_id is not None:
+        condition += """
+        AND i.first_seen_snapshot_id <= :snapshot_id
+        AND (i.last_seen_snapshot_id IS NULL OR i.last_seen_snapshot_id >= :snapshot_id)
+        """
+    return condition
+
+
+def _search_history(snapshot_id: Optional[int]) -> str:
+    """
+    Condition limiting accounts `a` to the searched snapshot or series.
+
+    Lists the user's own follow_intervals rows first and looks their
+    accounts up by id, so the cost follows the size of the user's history
+    rather than that of the whole accounts table.
+    """
+    return f"""
+        a.id IN (
+            SELECT i.account_id FROM follow_intervals i
+            WHERE {_search_intervals(snapshot_id)}
+        )
+    """
+
+
+def _search_scope(snapshot_id: Optional[int]) -> str:
+    """Condition checking accounts `a` found through another index against the searched snapshot or series."""
+    return f"""
+        EXISTS (
+            SELECT 1 FROM follow_intervals i
+            WHERE {_search_intervals(snapshot_id)} AND i.account_id = a.id
+        )
+    """
+
+
+async def search_accounts(
+    user_id: int,
+    guild_id: int,
+    query: str,
+    snapshot_type: str = "followers",
+    snapshot_id: Optional[int] = None,
+    limit: int = 25
+) -> list[dict]:
+    """
+    Find accounts whose username or full name matches `query`, best first.
+
+    Searches one snapshot when `snapshot_id` is given, otherwise everyone
+    who ever appeared in the user's uploads of `snapshot_type`. Only the
+    user's own accounts are looked through, so accounts uploaded by other
+    users don't slow it down. Queries of three or more characters also
+    match anywhere in the username or full name. When that finds fewer
+    than `limit` accounts, near misses (typos) are looked up in the
+    trigram index and added.
+
+    Returns:
+        List of dicts with 'ig_user_id', 'username', 'fullname',
+        'profile_url', 'match' (one of SEARCH_MATCHES or 'fuzzy') and
+        'current' (still in the latest upload). Snapshot searches also
+        include that snapshot's 'followed_by_you' and 'is_verified'.
+    """
+    query = query.strip().lstrip('@').lower()
+    if not query or limit <= 0:
+        return []
+
+    prefix = _like_escape(query) + "%"
+    params = {
+        "user_id": user_id,
+        "guild_id": guild_id,
+        "snapshot_type": snapshot_type,
+        "snapshot_id": snapshot_id,
+        "query": query,
+        "glob": re.sub(r"([*?\[])", r"[\1]", query) + "*",
+        "prefix": prefix,
+        "word_prefix": "% " + prefix,
+        "substring": "%" + prefix,
     }
+    columns = f"""
+        a.id, a.ig_user_id, a.username, a.fullname,
+        EXISTS (
+            SELECT 1 FROM follow_intervals i
+            WHERE i.user_id = :user_id AND i.guild_id = :guild_id
+              AND i.snapshot_type = :snapshot_type AND i.account_id = a.id
+              AND i.last_seen_snapshot_id IS NULL
+        ) AS current,
+        CASE WHEN a.username = :query THEN 0
+             WHEN a.username LIKE :prefix ESCAPE '\\' THEN 1
+             WHEN a.fullname LIKE :prefix ESCAPE '\\'
+               OR a.fullname LIKE :word_prefix ESCAPE '\\' THEN 2
+             ELSE 3 END AS tier
+    """
+    history = _search_history(snapshot_id)
+
+    async with connection() as db:
+        # Username order puts an exact match first, then the other prefixes
+        cursor = await db.execute(
+            f"""
+            SELECT {columns} FROM accounts a
+            WHERE {history} AND a.username GLOB :glob
+            ORDER BY a.username LIMIT :limit
+            """,
+            {**params, "limit": limit}
+        )
+        rows = list(await cursor.fetchall())
+
+        if len(rows) < limit and len(query) >= 3:
+            cursor = await db.execute(
+                f"""
+                SELECT {columns} FROM accounts a
+                WHERE {history}
+                  AND (a.username LIKE :substring ESCAPE '\\'
+                       OR a.fullname LIKE :substring ESCAPE '\\')
+                  AND a.id NOT IN (SELECT value FROM json_each(:found))
+                ORDER BY tier, length(a.username), a.username
+                LIMIT :limit
+                """,
+                {
+                    **params,
+                    "found": json.dumps([row["id"] for row in rows]),
+                    "limit": limit - len(rows),
+                }
+            )
+            rows += await cursor.fetchall()
+
+        results = [{**dict(row), "match": SEARCH_MATCHES[row["tier"]]} for row in rows]
+
+        if len(results) < limit and len(query) >= 4:
+            results += await _fuzzy_matches(
+                db, query, columns, _search_scope(snapshot_id), params, results, limit
+            )
+
+        if snapshot_id is not None and results:
+            await _attach_flags(db, snapshot_id, results)
+
+    for result in results:
+        result["current"] = bool(result["current"])
+        result["profile_url"] = PROFILE_URL_PREFIX + result["username"]
+        del result["id"], result["tier"]
+    return results
+
+
+def _similarity(query: str, text: str) -> float:
+    """How closely `text`, or its start, resembles `query` (0-1)."""
+    text = text.lower()
+    return max(
+        SequenceMatcher(None, query, text).ratio(),
+        SequenceMatcher(None, query, text[:len(query)]).ratio()
+    )
+
+
+async def _fuzzy_matches(
+    db: aiosqlite.Connection,
+    query: str,
+    columns: str,
+    scope: str,
+    params: dict,
+    found: list[dict],
+    limit: int
+) -> list[dict]:
+    """Accounts sharing trigrams with `query`, ranked by similarity."""
+    # Trigrams of the query with each character dropped too, so a swapped
+    # or extra letter still shares a trigram with the intended name
+    variants = [query] + [query[:i] + query[i + 1:] for i in range(len(query))]
+    trigrams = {variant[i:i + 3] for variant in variants for i in range(len(variant) - 2)}
+
+    # Look candidates up by the rarest trigrams only: one shared by every
+    # username ("use", "ser") would pull in the whole table
+    cursor = await db.execute(
+        """
+        SELECT term, doc FROM accounts_fts_vocab
+        WHERE term IN (SELECT value FROM json_each(?))
+        ORDER BY doc
+        """,
+        (json.dumps(sorted(trigrams)),)
+    )
+    selected, postings = [], 0
+    for term, doc in await cursor.fetchall():
+        if selected and postings + doc > SEARCH_FUZZY_MAX_POSTINGS:
+            break
+        selected.append(term)
+        postings += doc
+    if not selected:
+        return []
+
+    cursor = await db.execute(
+        f"""
+        SELECT {columns}
+        FROM accounts_fts JOIN accounts a ON a.id = accounts_fts.rowid
+        WHERE accounts_fts MATCH :fuzzy AND {scope}
+          AND a.id NOT IN (SELECT value FROM json_each(:found))
+        ORDER BY accounts_fts.rank
+        LIMIT {SEARCH_FUZZY_CANDIDATES}
+        """,
+        {
+            **params,
+            "fuzzy": " OR ".join(_fts_phrase(trigram) for trigram in selected),
+            "found": json.dumps([result["id"] for result in found]),
+        }
+    )
+
+    scored = []
+    for row in await cursor.fetchall():
+        similarity = max(
+            _similarity(query, row["username"]),
+            _similarity(query, row["fullname"] or "")
+        )
+        if similarity >= SEARCH_FUZZY_MIN_SIMILARITY:
+            scored.append((similarity, {**dict(row), "match": "fuzzy"}))
+
+    scored.sort(key=lambda item: (-item[0], item[1]["username"]))
+    return [result for _, result in scored[:limit - len(found)]]
+
+
+async def _attach_flags(db: aiosqlite.Connection, snapshot_id: int, results: list[dict]):
+    """Add a snapshot's followed_by_you/is_verified values to search results."""
+    members, params = await _snapshot_members_query(
+        db, snapshot_id, accounts="SELECT value FROM json_each(:account_ids)"
+    )
+    params["account_ids"] = json.dumps([result["id"] for result in results])
+    cursor = await db.execute(_records_from(members), params)
+    flags = {row["username"]: row for row in await cursor.fetchall()}
+    for result in results:
+        row = flags.get(result["username"])
+        result["followed_by_you"] = row["followed_by_you"] if row else ""
+        result["is_verified"] = row["is_verified"] if row else ""
 
 
 # ============================================================================
 # REQUESTED FOLLOWS TRACKING
 # ============================================================================
 
+def _normalize_usernames(usernames: list[str]) -> list[str]:
+    """Lowercase usernames and drop '@' prefixes and blanks."""
+    normalized = (username.strip().lstrip('@').lower() for username in usernames)
+    return [username for username in normalized if username]
+
+
 async def add_requested(
     user_id: int,
     guild_id: int,
@@ -232,34 +1873,28 @@ async def add_requested(
     """
     Add usernames to the requested list.
 
+    All usernames are inserted by one statement; ones already on the list
+    (or repeated in `usernames`) are skipped.
+
     Returns:
         tuple: (added_count, skipped_count)
     """
-    added = 0
-    skipped = 0
-
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        for username in usernames:
-            username = username.strip().lstrip('@').lower()
-            if not username:
-                continue
-
-            try:
-                await db.execute(
-                    """
-                    INSERT INTO requested (user_id, guild_id, username, notes)
-                    VALUES (?, ?, ?, ?)
-                    """,
-                    (user_id, guild_id, username, notes)
-                )
-                added += 1
-            except aiosqlite.IntegrityError:
-                # Already exists
-                skipped += 1
+    usernames = _normalize_usernames(usernames)
+    if not usernames:
+        return 0, 0
 
+    async with write_connection() as db:
+        cursor = await db.execute(
+            """
+            INSERT OR IGNORE INTO requested (user_id, guild_id, username, notes)
+            SELECT ?, ?, value, ? FROM json_each(?)
+            """,
+            (user_id, guild_id, notes, json.dumps(usernames))
+        )
+        added = cursor.rowcount
         await db.commit()
 
-    return added, skipped
+    return added, len(usernames) - added
 
 
 async def remove_requested(
@@ -273,23 +1908,20 @@ async def remove_requested(
     Returns:
         Number of removed entries
     """
-    removed = 0
-
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        for username in usernames:
-            username = username.strip().lstrip('@').lower()
-            if not username:
-                continue
-
-            cursor = await db.execute(
-                """
-                DELETE FROM requested
-                WHERE user_id = ? AND guild_id = ? AND username = ?
-                """,
-                (user_id, guild_id, username)
-            )
-            removed += cursor.rowcount
+    usernames = _normalize_usernames(usernames)
+    if not usernames:
+        return 0
 
+    async with write_connection() as db:
+        cursor = await db.execute(
+            """
+            DELETE FROM requested
+            WHERE user_id = ? AND guild_id = ?
+              AND username IN (SELECT value FROM json_each(?))
+            """,
+            (user_id, guild_id, json.dumps(usernames))
+        )
+        removed = cursor.rowcount
         await db.commit()
 
     return removed
@@ -301,8 +1933,7 @@ async def get_requested(
     limit: int = 100
 ) -> list[dict]:
     """Get all requested usernames for a user."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with connection() as db:
         cursor = await db.execute(
             """
             SELECT * FROM requested
@@ -316,9 +1947,23 @@ async def get_requested(
         return [dict(row) for row in rows]
 
 
+async def get_requested_usernames(user_id: int, guild_id: int) -> list[str]:
+    """Get every requested username for a user, sorted."""
+    async with connection() as db:
+        cursor = await db.execute(
+            """
+            SELECT username FROM requested
+            WHERE user_id = ? AND guild_id = ?
+            ORDER BY username
+            """,
+            (user_id, guild_id)
+        )
+        return [row[0] for row in await cursor.fetchall()]
+
+
 async def get_requested_count(user_id: int, guild_id: int) -> int:
     """Get count of requested usernames."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         cursor = await db.execute(
             """
             SELECT COUNT(*) FROM requested
@@ -332,7 +1977,7 @@ async def get_requested_count(user_id: int, guild_id: int) -> int:
 
 async def clear_requested(user_id: int, guild_id: int) -> int:
     """Clear all requested usernames for a user."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with write_connection() as db:
         cursor = await db.execute(
             """
             DELETE FROM requested
@@ -344,23 +1989,22 @@ async def clear_requested(user_id: int, guild_id: int) -> int:
         return cursor.rowcount
 
 
-async def check_requested_accepted(
-    user_id: int,
-    guild_id: int,
-    followers_records: list[dict]
-) -> list[str]:
+async def check_requested_accepted(user_id: int, guild_id: int) -> list[str]:
     """
-    Check which requested users have accepted (now in followers list).
+    Check which requested users have accepted (now in the latest followers).
 
     Returns:
-        List of usernames that accepted the follow request
+        Sorted list of requested usernames that are current followers
     """
-    requested = await get_requested(user_id, guild_id, limit=1000)
-    requested_usernames = {r['username'].lower() for r in requested}
-
-    follower_usernames = {r['username'].lower() for r in followers_records}
-
-    # Find requested users who are now followers
-    accepted = requested_usernames & follower_usernames
-
-    return list(accepted)
+    async with connection() as db:
+        cursor = await db.execute(
+            f"""
+            SELECT r.username
+            FROM requested r
+            WHERE r.user_id = ? AND r.guild_id = ?
+              AND {_follows_now("r")}
+            ORDER BY r.username
+            """,
+            (user_id, guild_id)
+        )
+        return [row[0] for row in await cursor.fetchall()]
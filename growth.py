@@ -0,0 +1,127 @@
+import numpy as np
+
+# Windows, in days, of the rolling averages of daily follower change
+ROLLING_WINDOWS = (7, 30)
+
+# A forecast extends a line fitted to this many recent days ...
+FORECAST_FIT_DAYS = 30
+# ... this many days past the latest upload
+FORECAST_DAYS = 30
+
+
+def upload_dates(snapshots: list[dict]) -> np.ndarray:
+    """Upload times as a datetime64[s] array, converted in one call."""
+    values = [s['uploaded_at'] for s in snapshots]
+    if values and isinstance(values[0], str):
+        # Timestamps are stored in UTC; numpy only rejects the explicit offset
+        values = [value.removesuffix('Z').removesuffix('+00:00') for value in values]
+    return np.array(values, dtype='datetime64[s]')
+
+
+def follower_counts(snapshots: list[dict]) -> np.ndarray:
+    return np.array([s['total_followers'] for s in snapshots], dtype=np.int64)
+
+
+def resample_daily(dates: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Put follower counts on a grid of one value per day.
+
+    The grid runs from the day of the first upload to the day of the last.
+    Each day gets the count at its end, interpolated between the uploads
+    either side of it, so a gap between uploads is spread evenly over the
+    days it covers. `dates` must be in ascending order.
+
+    Returns:
+        Tuple of (days as datetime64[D], counts as float64)
+    """
+    days = np.arange(
+        dates[0].astype('datetime64[D]'),
+        dates[-1].astype('datetime64[D]') + np.timedelta64(1, 'D')
+    )
+    day_ends = (days + np.timedelta64(1, 'D')).astype('datetime64[s]').astype(np.int64)
+    # Past the last upload, np.interp holds its count
+    return days, np.interp(day_ends, dates.astype(np.int64), counts)
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Mean of each value and the window - 1 before it (fewer at the start)."""
+    sums = np.cumsum(values, dtype=np.float64)
+    sums[window:] = sums[window:] - sums[:-window]
+    return sums / np.minimum(np.arange(1, len(values) + 1), window)
+
+
+def linear_forecast(
+    days: np.ndarray,
+    counts: np.ndarray,
+    fit_days: int = FORECAST_FIT_DAYS,
+    ahead: int = FORECAST_DAYS
+) -> tuple[np.ndarray, np.ndarray, float]:
+    """
+    Project the latest count forward at the recent rate of growth.
+
+    The rate is the slope of a least-squares line through the last
+    `fit_days` daily counts.
+
+    Returns:
+        Tuple of (the next `ahead` days, projected counts, followers per day)
+    """
+    recent = counts[-fit_days:]
+    slope = np.polyfit(np.arange(len(recent)), recent, 1)[0] if len(recent) > 1 else 0.0
+    future = np.arange(1, ahead + 1)
+    return days[-1] + future, counts[-1] + slope * future, float(slope)
+
+
+def daily_growth(snapshots: list[dict]) -> dict:
+    """
+    Per-day growth over a history of follower snapshots, oldest first.
+
+    Uploads rarely come at regular intervals, so the counts are first
+    resampled to one per day; changes between them are then comparable.
+
+    Returns:
+        dict with 'days', 'counts' (interpolated), 'change' (followers
+        gained each day), 'percent' (change as a percentage of the day
+        before), 'rolling' (window in days -> rolling mean of 'change'),
+        and 'forecast_days', 'forecast' and 'slope' from linear_forecast()
+    """
+    days, counts = resample_daily(upload_dates(snapshots), follower_counts(snapshots))
+
+    change = np.diff(counts, prepend=counts[0])
+    before = np.concatenate(([counts[0]], counts[:-1]))
+    percent = np.divide(change * 100, before, out=np.zeros_like(change), where=before > 0)
+
+    forecast_days, forecast, slope = linear_forecast(days, counts)
+
+    return {
+        'days': days,
+        'counts': counts,
+        'change': change,
+        'percent': percent,
+        'rolling': {window: rolling_mean(change, window) for window in ROLLING_WINDOWS},
+        'forecast_days': forecast_days,
+        'forecast': forecast,
+        'slope': slope,
+    }
+
+
+def growth_summary(snapshots: list[dict]) -> dict:
+    """
+    Headline numbers of daily_growth(), as plain Python values.
+
+    Returns:
+        dict with 'days' (length of the history), 'latest' (follower
+        count), 'average' (window -> mean followers per day over its last
+        window), 'percent' (mean daily % change over the longest window),
+        'slope' (fitted followers per day) and 'forecast' (projected count
+        FORECAST_DAYS after the latest upload)
+    """
+    growth = daily_growth(snapshots)
+    longest = max(ROLLING_WINDOWS)
+    return {
+        'days': len(growth['days']),
+        'latest': int(follower_counts(snapshots[-1:])[0]),
+        'average': {window: float(mean[-1]) for window, mean in growth['rolling'].items()},
+        'percent': float(growth['percent'][-longest:].mean()),
+        'slope': growth['slope'],
+        'forecast': round(float(growth['forecast'][-1])),
+    }
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """
+    A size-bounded mapping that evicts the least recently used entries.
+
+    By default the size is the number of entries. Pass `weigh` to measure
+    each value instead (e.g. bytes or rows); values heavier than the whole
+    budget are not cached at all. `on_evict(key, value)` is called for each
+    entry dropped to make room, e.g. to delete a file it stands for.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        weigh: Optional[Callable[[Any], int]] = None,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None
+    ):
+        self.max_size = max_size
+        self._weigh = weigh or (lambda value: 1)
+        self._on_evict = on_evict
+        self._entries: OrderedDict = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value and mark it as recently used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        """Cache a value, evicting the oldest entries to make room."""
+        self.pop(key)
+        weight = self._weigh(value)
+        if weight > self.max_size:
+            return
+        self._entries[key] = (value, weight)
+        self.size += weight
+        while self.size > self.max_size:
+            evicted_key, (evicted, evicted_weight) = self._entries.popitem(last=False)
+            self.size -= evicted_weight
+            self.evictions += 1
+            if self._on_evict:
+                self._on_evict(evicted_key, evicted)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove a value without counting it as an eviction."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        self.size -= entry[1]
+        return entry[0]
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        """
+        Counters for monitoring how well the cache is doing.
+
+        Returns:
+            dict with 'entries', 'size', 'max_size', 'hits', 'misses',
+            'evictions' and 'hit_rate'
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size": self.size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
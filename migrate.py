@@ -0,0 +1,65 @@
+"""
+Upgrade an existing follower database to the current storage format.
+
+Usage:
+    python migrate.py [--vacuum]
+
+Schema changes are applied automatically, then snapshots that were saved
+as full copies are converted into checkpoints and deltas, and summary
+counts are filled in for snapshots saved before they were stored.
+"""
+import argparse
+import asyncio
+import sqlite3
+
+from database import (
+    DATABASE_PATH,
+    backfill_snapshot_stats,
+    close_db,
+    compact_snapshots,
+    init_db
+)
+
+
+def progress_reporter(verb: str):
+    def report(done: int, total: int):
+        print(f'\r{verb} {done}/{total} snapshots', end='', flush=True)
+    return report
+
+
+async def migrate(vacuum: bool = False):
+    print(f'Migrating {DATABASE_PATH}')
+    await init_db()
+    try:
+        converted = await compact_snapshots(progress=progress_reporter('Converted'))
+        if converted:
+            print()
+        backfilled = await backfill_snapshot_stats(progress=progress_reporter('Counted'))
+        if backfilled:
+            print()
+    finally:
+        await close_db()
+
+    print(f'Done: {converted} snapshot(s) converted, {backfilled} counted')
+
+    if vacuum:
+        # Give the space freed by the conversion back to the filesystem
+        print('Vacuuming...')
+        with sqlite3.connect(DATABASE_PATH) as conn:
+            conn.execute('VACUUM')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--vacuum',
+        action='store_true',
+        help='Rebuild the database file afterwards to reclaim disk space'
+    )
+    args = parser.parse_args()
+
+    asyncio.run(migrate(vacuum=args.vacuum))
+
+
+if __name__ == '__main__':
+    main()
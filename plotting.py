@@ -1,14 +1,87 @@
+import matplotlib
+matplotlib.use('Agg')  # Render to PNG only; never look for a display
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
-from datetime import datetime
+from datetime import datetime, timedelta
 from io import BytesIO
 from typing import Optional
 import numpy as np
 
+from growth import FORECAST_DAYS, daily_growth, follower_counts, upload_dates
+
 
 # Set style
 plt.style.use('seaborn-v0_8-darkgrid')
 
+# Long histories are downsampled so render time doesn't grow with them:
+# at most this many points on a trend line and bars on a growth chart
+TREND_MAX_POINTS = 250
+GROWTH_MAX_BARS = 60
+
+# Up to this many points/bars each one gets a marker and a value label;
+# beyond it only the highest, lowest and latest values are labelled
+ANNOTATE_ALL_MAX = 30
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Pick at most `max_points` indices that keep the visual shape of a series.
+
+    Largest-Triangle-Three-Buckets: the first and last points are kept and
+    the rest are split into equal buckets; from each bucket the point
+    forming the largest triangle with the previously kept point and the
+    next bucket's average is kept.
+    """
+    n = len(x)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+
+    keep = np.empty(max_points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            following = slice(end, edges[bucket + 2])
+            next_x, next_y = x[following].mean(), y[following].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(area.argmax())
+        keep[bucket + 1] = previous
+    return keep
+
+
+def _trend_points(snapshots: list[dict]) -> tuple[np.ndarray, np.ndarray]:
+    """Dates and follower counts to draw, downsampled for long histories."""
+    dates = upload_dates(snapshots)
+    counts = follower_counts(snapshots)
+    keep = lttb(dates.astype(np.int64), counts, TREND_MAX_POINTS)
+    # Always draw the true highest and lowest counts
+    keep = np.union1d(keep, [counts.argmax(), counts.argmin()])
+    return dates[keep], counts[keep]
+
+
+def _date_format(dates: np.ndarray) -> str:
+    """Tick label format; histories longer than a year need the year."""
+    if len(dates) and dates[-1] - dates[0] > np.timedelta64(365, 'D'):
+        return '%b %Y'
+    return '%b %d'
+
+
+def _labelled(values: np.ndarray) -> np.ndarray:
+    """Indices of the values to label: all of them, or the extremes and latest."""
+    if len(values) <= ANNOTATE_ALL_MAX:
+        return np.arange(len(values))
+    return np.unique([values.argmax(), values.argmin(), len(values) - 1])
+
 
 def create_follower_trend_plot(snapshots: list[dict]) -> BytesIO:
     """
@@ -23,19 +96,12 @@ def create_follower_trend_plot(snapshots: list[dict]) -> BytesIO:
     if not snapshots:
         return create_empty_plot("No data available yet")
 
-    dates = []
-    counts = []
-
-    for s in snapshots:
-        uploaded_at = s['uploaded_at']
-        if isinstance(uploaded_at, str):
-            uploaded_at = datetime.fromisoformat(uploaded_at.replace('Z', '+00:00'))
-        dates.append(uploaded_at)
-        counts.append(s['total_followers'])
+    dates, counts = _trend_points(snapshots)
 
     fig, ax = plt.subplots(figsize=(10, 6))
 
-    ax.plot(dates, counts, marker='o', linewidth=2, markersize=8, color='#5865F2')
+    marker = 'o' if len(dates) <= ANNOTATE_ALL_MAX else None
+    ax.plot(dates, counts, marker=marker, linewidth=2, markersize=8, color='#5865F2')
     ax.fill_between(dates, counts, alpha=0.3, color='#5865F2')
 
     ax.set_xlabel('Date', fontsize=12)
@@ -44,12 +110,13 @@ def create_follower_trend_plot(snapshots: list[dict]) -> BytesIO:
 
     # Format x-axis dates
     if len(dates) > 1:
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%b %d'))
+        ax.xaxis.set_major_formatter(mdates.DateFormatter(_date_format(dates)))
         ax.xaxis.set_major_locator(mdates.AutoDateLocator())
         plt.xticks(rotation=45)
 
-    # Add annotations for each point
-    for i, (date, count) in enumerate(zip(dates, counts)):
+    # Label each point, or only the extremes and latest of a long history
+    for i in _labelled(counts):
+        date, count = dates[i], counts[i]
         ax.annotate(
             str(count),
             (date, count),
@@ -134,12 +201,13 @@ def create_comparison_pie_chart(
     return buf
 
 
-def create_change_bar_chart(comparison: dict) -> BytesIO:
+def create_change_bar_chart(comparison: dict, title: Optional[str] = None) -> BytesIO:
     """
     Create a bar chart showing gained/lost followers.
 
     Args:
         comparison: Dict with 'gained_count', 'lost_count', 'net_change'
+        title: Optional chart title (defaults to changes since last upload)
 
     Returns:
         BytesIO buffer containing the plot image
@@ -172,7 +240,7 @@ def create_change_bar_chart(comparison: dict) -> BytesIO:
 
     ax.axhline(y=0, color='gray', linestyle='-', linewidth=0.8)
     ax.set_ylabel('Count', fontsize=12)
-    ax.set_title('Follower Changes Since Last Upload', fontsize=14, fontweight='bold')
+    ax.set_title(title or 'Follower Changes Since Last Upload', fontsize=14, fontweight='bold')
 
     plt.tight_layout()
 
@@ -197,44 +265,48 @@ def create_growth_rate_plot(snapshots: list[dict]) -> BytesIO:
     if len(snapshots) < 2:
         return create_empty_plot("Need at least 2 uploads to show growth rate")
 
-    dates = []
-    growth_rates = []
-
-    for i in range(1, len(snapshots)):
-        prev = snapshots[i - 1]
-        curr = snapshots[i]
-
-        uploaded_at = curr['uploaded_at']
-        if isinstance(uploaded_at, str):
-            uploaded_at = datetime.fromisoformat(uploaded_at.replace('Z', '+00:00'))
-        dates.append(uploaded_at)
-
-        prev_count = prev['total_followers']
-        curr_count = curr['total_followers']
-
-        if prev_count > 0:
-            rate = ((curr_count - prev_count) / prev_count) * 100
-        else:
-            rate = 0
-
-        growth_rates.append(rate)
+    dates = upload_dates(snapshots)
+    counts = follower_counts(snapshots)
+
+    # One bar per upload, or per run of uploads once there are too many
+    bucketed = len(snapshots) - 1 > GROWTH_MAX_BARS
+    ends = np.arange(len(snapshots))
+    if bucketed:
+        ends = np.unique(np.linspace(0, len(snapshots) - 1, GROWTH_MAX_BARS + 1).round().astype(np.int64))
+
+    prev_counts = counts[ends[:-1]]
+    curr_counts = counts[ends[1:]]
+    growth_rates = np.where(
+        prev_counts > 0,
+        (curr_counts - prev_counts) / np.maximum(prev_counts, 1) * 100,
+        0.0
+    )
+    dates = dates[ends[1:]]
 
     fig, ax = plt.subplots(figsize=(10, 6))
 
-    colors = ['#57F287' if r >= 0 else '#ED4245' for r in growth_rates]
+    colors = np.where(growth_rates >= 0, '#57F287', '#ED4245')
 
     bars = ax.bar(range(len(dates)), growth_rates, color=colors, edgecolor='white', linewidth=1)
 
-    ax.set_xticks(range(len(dates)))
-    ax.set_xticklabels([d.strftime('%b %d') for d in dates], rotation=45)
+    # Label every bar, or evenly spaced ones when there are many
+    step = -(-len(dates) // ANNOTATE_ALL_MAX)
+    ticks = np.arange(0, len(dates), step)
+    ax.set_xticks(ticks)
+    ax.set_xticklabels(
+        [day.strftime(_date_format(dates)) for day in dates[ticks].astype('datetime64[D]').astype(object)],
+        rotation=45
+    )
 
     ax.axhline(y=0, color='gray', linestyle='-', linewidth=0.8)
     ax.set_ylabel('Growth Rate (%)', fontsize=12)
     ax.set_xlabel('Date', fontsize=12)
-    ax.set_title('Follower Growth Rate Between Uploads', fontsize=14, fontweight='bold')
+    title = 'Follower Growth Rate Over Time' if bucketed else 'Follower Growth Rate Between Uploads'
+    ax.set_title(title, fontsize=14, fontweight='bold')
 
     # Add value labels
-    for bar, rate in zip(bars, growth_rates):
+    for i in _labelled(growth_rates):
+        bar, rate = bars[i], growth_rates[i]
         height = bar.get_height()
         ax.annotate(
             f'{rate:+.1f}%',
@@ -256,6 +328,94 @@ def create_growth_rate_plot(snapshots: list[dict]) -> BytesIO:
     return buf
 
 
+def _bucket_means(days: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Average a long daily series down to at most TREND_MAX_POINTS values.
+
+    Unlike lttb(), which keeps real points, this suits rates and averages:
+    picking single days out of a noisy series would draw noise.
+    """
+    if len(days) <= TREND_MAX_POINTS:
+        return days, values
+    starts = np.linspace(0, len(days), TREND_MAX_POINTS, endpoint=False).astype(np.int64)
+    sizes = np.diff(starts, append=len(days))
+    return days[starts + sizes // 2], np.add.reduceat(values, starts) / sizes
+
+
+def create_daily_growth_plot(snapshots: list[dict]) -> BytesIO:
+    """
+    Create a plot of follower growth per day, however far apart uploads are.
+
+    The top panel shows the follower count resampled to one value per day
+    and a linear forecast; the bottom one shows the daily change with its
+    rolling averages.
+
+    Args:
+        snapshots: List of snapshot dicts with 'uploaded_at' and 'total_followers'
+
+    Returns:
+        BytesIO buffer containing the plot image
+    """
+    if len(snapshots) < 2:
+        return create_empty_plot("Need at least 2 uploads to show growth rate")
+
+    growth = daily_growth(snapshots)
+    days = growth['days']
+
+    fig, (ax1, ax2) = plt.subplots(
+        2, 1, figsize=(10, 8), sharex=True, gridspec_kw={'height_ratios': [3, 2]}
+    )
+
+    # Follower count and where it is heading
+    keep = lttb(days.astype(np.int64), growth['counts'], TREND_MAX_POINTS)
+    ax1.plot(days[keep], growth['counts'][keep], linewidth=2, color='#5865F2', label='Followers')
+    ax1.plot(
+        np.concatenate((days[-1:], growth['forecast_days'])),
+        np.concatenate((growth['counts'][-1:], growth['forecast'])),
+        linestyle='--', linewidth=2, color='#5865F2', alpha=0.6,
+        label=f'Forecast ({FORECAST_DAYS} days)'
+    )
+    ax1.annotate(
+        f"{growth['forecast'][-1]:,.0f}",
+        (growth['forecast_days'][-1], growth['forecast'][-1]),
+        textcoords="offset points",
+        xytext=(0, 10),
+        ha='center',
+        fontsize=9
+    )
+    ax1.set_ylabel('Follower Count', fontsize=12)
+    ax1.set_title('Daily Follower Growth', fontsize=14, fontweight='bold')
+    ax1.legend(loc='upper left', fontsize=9)
+
+    # Daily change: bars for a short history, a faint line for a long one
+    change = growth['change']
+    if len(days) <= GROWTH_MAX_BARS:
+        colors = np.where(change >= 0, '#57F287', '#ED4245')
+        ax2.bar(days, change, color=colors, alpha=0.6, label='Per day')
+    else:
+        ax2.plot(*_bucket_means(days, change), linewidth=1, color='gray', alpha=0.5, label='Per day')
+    for (window, mean), color in zip(growth['rolling'].items(), ('#EB459E', '#5865F2')):
+        ax2.plot(*_bucket_means(days, mean), linewidth=2, color=color, label=f'{window}-day average')
+
+    ax2.axhline(y=0, color='gray', linestyle='-', linewidth=0.8)
+    ax2.set_ylabel('Followers / Day', fontsize=12)
+    ax2.set_xlabel('Date', fontsize=12)
+    ax2.legend(loc='best', fontsize=9)
+
+    ax2.xaxis.set_major_formatter(mdates.DateFormatter(_date_format(days)))
+    ax2.xaxis.set_major_locator(mdates.AutoDateLocator())
+    plt.setp(ax2.get_xticklabels(), rotation=45)
+
+    plt.tight_layout()
+
+    buf = BytesIO()
+    plt.savefig(buf, format='png', dpi=150, bbox_inches='tight')
+    buf.seek(0)
+    plt.close(fig)
+
+    return buf
+
+
 def create_empty_plot(message: str) -> BytesIO:
     """Create an empty plot with a message."""
     fig, ax = plt.subplots(figsize=(8, 6))
@@ -283,20 +443,27 @@ def create_empty_plot(message: str) -> BytesIO:
 
 def create_summary_dashboard(
     snapshots: list[dict],
-    current_analysis: dict,
-    comparison: Optional[dict] = None
+    latest: Optional[dict] = None
 ) -> BytesIO:
     """
     Create a comprehensive dashboard with multiple plots.
 
     Args:
         snapshots: List of historical snapshots
-        current_analysis: Analysis of current upload
-        comparison: Optional comparison with previous upload
+        latest: Latest followers snapshot row, with its stored summary counts
+            (mutual_count, fan_count, gained_count, lost_count, net_change)
 
     Returns:
         BytesIO buffer containing the dashboard image
     """
+    latest = latest or {}
+    total = latest.get('total_followers', 0)
+    mutual = latest.get('mutual_count') or 0
+    fans = latest.get('fan_count') or 0
+
+    # Changes are only known once there is a previous upload to compare with
+    comparison = latest if latest.get('gained_count') is not None else None
+
     fig = plt.figure(figsize=(14, 10))
 
     # 2x2 grid
@@ -305,19 +472,12 @@ def create_summary_dashboard(
     # Plot 1: Follower trend (top left)
     ax1 = fig.add_subplot(gs[0, 0])
     if snapshots:
-        dates = []
-        counts = []
-        for s in snapshots:
-            uploaded_at = s['uploaded_at']
-            if isinstance(uploaded_at, str):
-                uploaded_at = datetime.fromisoformat(uploaded_at.replace('Z', '+00:00'))
-            dates.append(uploaded_at)
-            counts.append(s['total_followers'])
-
-        ax1.plot(dates, counts, marker='o', linewidth=2, color='#5865F2')
+        dates, counts = _trend_points(snapshots)
+        marker = 'o' if len(dates) <= ANNOTATE_ALL_MAX else None
+        ax1.plot(dates, counts, marker=marker, linewidth=2, color='#5865F2')
         ax1.fill_between(dates, counts, alpha=0.3, color='#5865F2')
         if len(dates) > 1:
-            ax1.xaxis.set_major_formatter(mdates.DateFormatter('%b %d'))
+            ax1.xaxis.set_major_formatter(mdates.DateFormatter(_date_format(dates)))
             plt.setp(ax1.xaxis.get_majorticklabels(), rotation=45)
     ax1.set_title('Follower Trend', fontweight='bold')
     ax1.set_xlabel('Date')
@@ -325,10 +485,6 @@ def create_summary_dashboard(
 
     # Plot 2: Relationship breakdown (top right)
     ax2 = fig.add_subplot(gs[0, 1])
-    mutual = len(current_analysis.get('mutual', []))
-    fans = len(current_analysis.get('fans', []))
-    not_following = len(current_analysis.get('you_dont_follow_back', []))
-
     if mutual + fans > 0:
         labels = ['Mutual', 'Fans']
         sizes = [mutual, fans]
@@ -361,7 +517,7 @@ def create_summary_dashboard(
     stats_text = f"""
     📊 Current Stats
     ━━━━━━━━━━━━━━━━━━
-    Total Followers: {len(current_analysis.get('followers', []))}
+    Total Followers: {total}
     Mutual Follows: {mutual}
     Fans (don't follow back): {fans}
     Uploads: {len(snapshots)}
@@ -387,3 +543,51 @@ def create_summary_dashboard(
     plt.close(fig)
 
     return buf
+
+
+# Charts by the name render_chart() is called with
+CHARTS = {
+    'trend': create_follower_trend_plot,
+    'pie': create_comparison_pie_chart,
+    'changes': create_change_bar_chart,
+    'growth': create_growth_rate_plot,
+    'daily_growth': create_daily_growth_plot,
+    'dashboard': create_summary_dashboard,
+    'empty': create_empty_plot,
+}
+
+
+def render_chart(chart: str, *args) -> bytes:
+    """Render one of CHARTS and return the PNG bytes."""
+    return CHARTS[chart](*args).getvalue()
+
+
+def warm_up():
+    """
+    Render every chart once with sample data and throw the images away.
+
+    The first render in a process pays for font lookup and loading, style
+    and layout setup; rendering workers call this at startup so users don't.
+    """
+    start = datetime(2024, 1, 1)
+    snapshots = [
+        {
+            'uploaded_at': (start + timedelta(days=day)).isoformat(),
+            'total_followers': 100 + day,
+            'snapshot_type': 'followers',
+        }
+        for day in range(3)
+    ]
+    latest = {
+        **snapshots[-1],
+        'mutual_count': 60, 'fan_count': 42,
+        'gained_count': 3, 'lost_count': 2, 'net_change': 1,
+    }
+
+    render_chart('trend', snapshots)
+    render_chart('pie', 60, 42, 7)
+    render_chart('changes', latest)
+    render_chart('growth', snapshots)
+    render_chart('daily_growth', snapshots)
+    render_chart('dashboard', snapshots, latest)
+    render_chart('empty', 'Warming up')
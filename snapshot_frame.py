@@ -0,0 +1,224 @@
+import sys
+from array import array
+from typing import Iterable, Iterator, Sequence
+
+import numpy as np
+
+# Bits packed into records.flags / record_deltas.flags
+FLAG_FOLLOWED_BY_YOU = 1
+FLAG_NOT_FOLLOWED_BY_YOU = 2
+FLAG_VERIFIED = 4
+FLAG_NOT_VERIFIED = 8
+
+# Profile URLs are derived from the username instead of being stored
+PROFILE_URL_PREFIX = "https://www.instagram.com/"
+
+# Bytes CPython spends on a str besides its characters, plus the list
+# slot pointing at it
+_STR_OVERHEAD = sys.getsizeof("") + 8
+# Slot and hash of an interned string in the interpreter's intern table
+_INTERN_OVERHEAD = 16
+
+
+def pack_flags(followed_by_you: str, is_verified: str) -> int:
+    """Pack the YES/NO export columns into records.flags bits."""
+    flags = 0
+    if followed_by_you == "YES":
+        flags |= FLAG_FOLLOWED_BY_YOU
+    elif followed_by_you == "NO":
+        flags |= FLAG_NOT_FOLLOWED_BY_YOU
+    if is_verified == "YES":
+        flags |= FLAG_VERIFIED
+    elif is_verified == "NO":
+        flags |= FLAG_NOT_VERIFIED
+    return flags
+
+
+def pack_flag_columns(followed_by_you: Sequence[str], is_verified: Sequence[str]) -> bytes:
+    """pack_flags() over whole columns of upper-case YES/NO values."""
+    followed = np.asarray(followed_by_you, dtype=object)
+    verified = np.asarray(is_verified, dtype=object)
+    flags = (
+        np.where(followed == "YES", FLAG_FOLLOWED_BY_YOU, 0)
+        | np.where(followed == "NO", FLAG_NOT_FOLLOWED_BY_YOU, 0)
+        | np.where(verified == "YES", FLAG_VERIFIED, 0)
+        | np.where(verified == "NO", FLAG_NOT_VERIFIED, 0)
+    )
+    return flags.astype(np.uint8).tobytes()
+
+
+def _yes_no(flags: int, yes: int, no: int) -> str:
+    if flags & yes:
+        return "YES"
+    if flags & no:
+        return "NO"
+    return ""
+
+
+class SnapshotFrame:
+    """
+    Follower records as parallel columns.
+
+    Holds the records of one export, one parsed chunk of it, or one saved
+    snapshot: Instagram IDs, interned usernames and names (so snapshots of
+    the same followers share their strings), and both YES/NO columns
+    packed into one byte per record using the records.flags bits. Frames
+    read from the database also carry each record's account ID.
+
+    Indexing or iterating gives a record as a dict with the keys of
+    record(); slicing and filtering give another frame. A frame is never
+    changed once built, so frames can be shared and cached.
+    """
+
+    __slots__ = ("ig_user_ids", "usernames", "fullnames", "flags", "account_ids", "_nbytes")
+
+    def __init__(
+        self,
+        ig_user_ids: Iterable[str] = (),
+        usernames: Iterable[str] = (),
+        fullnames: Iterable[str] = (),
+        flags: Iterable[int] = b"",
+        account_ids: Iterable[int] = ()
+    ):
+        intern = sys.intern
+        self.ig_user_ids = list(ig_user_ids)
+        self.usernames = [intern(username) for username in usernames]
+        self.fullnames = [intern(fullname) if fullname else fullname for fullname in fullnames]
+        self.flags = bytes(flags)
+        self.account_ids = array("q", account_ids)
+        self._nbytes = None
+
+    @classmethod
+    def _of(
+        cls,
+        ig_user_ids: list,
+        usernames: list,
+        fullnames: list,
+        flags: bytes,
+        account_ids: array
+    ) -> "SnapshotFrame":
+        """Wrap columns taken from another frame, without copying or interning again."""
+        frame = cls.__new__(cls)
+        frame.ig_user_ids = ig_user_ids
+        frame.usernames = usernames
+        frame.fullnames = fullnames
+        frame.flags = flags
+        frame.account_ids = account_ids
+        frame._nbytes = None
+        return frame
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> "SnapshotFrame":
+        """
+        Build a frame from (account_id, flags, ig_user_id, username, fullname) rows.
+
+        Columns are pulled out one comprehension at a time rather than with
+        zip(*rows), which holds the GIL for the whole transpose and so would
+        stall the event loop even when this runs in a worker thread.
+        """
+        rows = list(rows)
+        return cls(
+            [row[2] for row in rows],
+            [row[3] for row in rows],
+            [row[4] for row in rows],
+            [row[1] for row in rows],
+            [row[0] for row in rows]
+        )
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> "SnapshotFrame":
+        """Build a frame from record dicts with user_id/ig_user_id, username, fullname and YES/NO fields."""
+        records = list(records)
+        return cls(
+            [record.get("ig_user_id", record.get("user_id", "")) for record in records],
+            [record.get("username", "") for record in records],
+            [record.get("fullname", "") for record in records],
+            [pack_flags(record.get("followed_by_you", ""), record.get("is_verified", "")) for record in records]
+        )
+
+    def __len__(self) -> int:
+        return len(self.usernames)
+
+    def __getitem__(self, key: int | slice) -> "dict | SnapshotFrame":
+        if isinstance(key, slice):
+            return self._of(
+                self.ig_user_ids[key], self.usernames[key], self.fullnames[key],
+                self.flags[key], self.account_ids[key]
+            )
+        return self.record(key)
+
+    def __iter__(self) -> Iterator[dict]:
+        return map(self.record, range(len(self)))
+
+    def record(self, index: int) -> dict:
+        """
+        One record as a dict.
+
+        Returns:
+            dict with 'ig_user_id', 'username', 'fullname', 'followed_by_you'
+            and 'is_verified' (YES, NO or ''), and 'profile_url'
+        """
+        flags = self.flags[index]
+        username = self.usernames[index]
+        return {
+            "ig_user_id": self.ig_user_ids[index],
+            "username": username,
+            "fullname": self.fullnames[index],
+            "followed_by_you": _yes_no(flags, FLAG_FOLLOWED_BY_YOU, FLAG_NOT_FOLLOWED_BY_YOU),
+            "is_verified": _yes_no(flags, FLAG_VERIFIED, FLAG_NOT_VERIFIED),
+            "profile_url": PROFILE_URL_PREFIX + username,
+        }
+
+    def to_dicts(self) -> list[dict]:
+        return list(self)
+
+    def take(self, indices: Sequence[int]) -> "SnapshotFrame":
+        """The records at `indices`, in that order."""
+        indices = np.asarray(indices, dtype=np.intp)
+        positions = indices.tolist()
+        account_ids = array("q")
+        if self.account_ids:
+            account_ids.frombytes(np.frombuffer(self.account_ids, dtype=np.int64)[indices].tobytes())
+        return self._of(
+            [self.ig_user_ids[i] for i in positions],
+            [self.usernames[i] for i in positions],
+            [self.fullnames[i] for i in positions],
+            np.frombuffer(self.flags, dtype=np.uint8)[indices].tobytes(),
+            account_ids
+        )
+
+    def has(self, flag: int) -> np.ndarray:
+        """Boolean mask of the records with a records.flags bit set."""
+        return (np.frombuffer(self.flags, dtype=np.uint8) & flag) != 0
+
+    def where(self, flag: int) -> "SnapshotFrame":
+        """The records with a records.flags bit set, e.g. FLAG_VERIFIED."""
+        return self.take(np.flatnonzero(self.has(flag)))
+
+    def count(self, flag: int) -> int:
+        """Number of records with a records.flags bit set."""
+        return int(np.count_nonzero(self.has(flag)))
+
+    def missing_from(self, other: "SnapshotFrame") -> list[int]:
+        """Indices of records whose account isn't in `other`, ordered by username."""
+        present = set(other.account_ids)
+        missing = [index for index, account_id in enumerate(self.account_ids) if account_id not in present]
+        missing.sort(key=self.usernames.__getitem__)
+        return missing
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Estimated memory use; strings shared with other frames are counted in each.
+
+        Worked out on first use, then kept, since the frame never changes.
+        """
+        if self._nbytes is None:
+            strings = (self.ig_user_ids, self.usernames, self.fullnames)
+            self._nbytes = (
+                self.account_ids.itemsize * len(self.account_ids) + len(self.flags)
+                + sum(sum(map(len, filter(None, column))) for column in strings)
+                + _STR_OVERHEAD * len(self) * len(strings)
+                + _INTERN_OVERHEAD * len(self) * 2
+            )
+        return self._nbytes
@@ -0,0 +1,82 @@
+from array import array
+from typing import Iterable, Optional
+
+import numpy as np
+
+# snapshot_type values, stored by their position in this tuple
+SNAPSHOT_TYPES = ("followers", "following")
+
+
+class SnapshotSeries:
+    """
+    One user's upload history as parallel arrays, oldest first.
+
+    Each upload takes 25 bytes (id, upload time as Unix seconds, follower
+    count, type code) instead of a dict; rows are turned back into dicts
+    only when asked for.
+    """
+
+    __slots__ = ("ids", "timestamps", "counts", "types")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.timestamps = array("q")
+        self.counts = array("q")
+        self.types = array("b")
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> "SnapshotSeries":
+        """Build a series from (id, timestamp, count, snapshot_type) rows, already in order."""
+        series = cls()
+        for snapshot_id, timestamp, count, snapshot_type in rows:
+            series.ids.append(snapshot_id)
+            series.timestamps.append(timestamp)
+            series.counts.append(count)
+            series.types.append(SNAPSHOT_TYPES.index(snapshot_type))
+        return series
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, snapshot_id: int, timestamp: int, count: int, snapshot_type: str) -> bool:
+        """
+        Insert an upload in (timestamp, id) order, unless it is already there.
+
+        Returns:
+            True if the upload was added
+        """
+        if snapshot_id in self.ids:
+            return False
+        # New uploads are nearly always the latest; step back over any that aren't
+        position = len(self.ids)
+        while position and (self.timestamps[position - 1], self.ids[position - 1]) > (timestamp, snapshot_id):
+            position -= 1
+        self.ids.insert(position, snapshot_id)
+        self.timestamps.insert(position, timestamp)
+        self.counts.insert(position, count)
+        self.types.insert(position, SNAPSHOT_TYPES.index(snapshot_type))
+        return True
+
+    def to_dicts(self, snapshot_type: Optional[str] = None) -> list[dict]:
+        """
+        Rows shaped like the snapshots table's, optionally of one type only.
+
+        Returns:
+            list of dicts with 'id', 'uploaded_at' (as SQLite's
+            CURRENT_TIMESTAMP writes it), 'total_followers' and 'snapshot_type'
+        """
+        uploaded_at = np.datetime_as_string(
+            np.frombuffer(self.timestamps, dtype=np.int64).astype("datetime64[s]")
+        ).tolist()
+        code = None if snapshot_type is None else SNAPSHOT_TYPES.index(snapshot_type)
+        return [
+            {
+                "id": snapshot_id,
+                "uploaded_at": timestamp.replace("T", " "),
+                "total_followers": count,
+                "snapshot_type": SNAPSHOT_TYPES[type_code],
+            }
+            for snapshot_id, timestamp, count, type_code
+            in zip(self.ids, uploaded_at, self.counts, self.types)
+            if code is None or type_code == code
+        ]
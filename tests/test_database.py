@@ -0,0 +1,115 @@
+import asyncio
+from pathlib import Path
+
+import aiosqlite
+import pytest
+
+import database
+from snapshot_frame import SnapshotFrame
+
+
+@pytest.fixture
+def db_path(tmp_path: Path, monkeypatch) -> Path:
+    path = tmp_path / "test.db"
+    monkeypatch.setattr(database, "DATABASE_PATH", path)
+    yield path
+    database._frames.clear()
+    database._series.clear()
+
+
+def run(coroutine):
+    """Run `coroutine` against the database, closing the pools afterwards."""
+    async def wrapper():
+        await database.init_db()
+        try:
+            return await coroutine
+        finally:
+            await database.close_db()
+    return asyncio.run(wrapper())
+
+
+def frame(*usernames: str) -> SnapshotFrame:
+    return SnapshotFrame.from_records(
+        {"user_id": str(i), "username": username, "followed_by_you": "NO", "is_verified": "NO"}
+        for i, username in enumerate(usernames)
+    )
+
+
+async def seed_legacy(path: Path, uploads: list[tuple[str, ...]]):
+    """Write followers uploads the way the bot did before schema versioning."""
+    async with aiosqlite.connect(path) as db:
+        await database._create_original_schema(db)
+        for day, usernames in enumerate(uploads, start=1):
+            cursor = await db.execute(
+                """
+                INSERT INTO snapshots (user_id, guild_id, uploaded_at, filename, total_followers)
+                VALUES (1, 0, ?, 'legacy.csv', ?)
+                """,
+                (f"2024-01-{day:02d} 12:00:00", len(usernames))
+            )
+            await db.executemany(
+                """
+                INSERT INTO records (snapshot_id, username, followed_by_you, is_verified)
+                VALUES (?, ?, 'NO', 'NO')
+                """,
+                [(cursor.lastrowid, username) for username in usernames]
+            )
+        await db.commit()
+
+
+def test_tenure_of_unconverted_legacy_series(db_path):
+    asyncio.run(seed_legacy(db_path, [("alice", "bob"), ("alice", "bob", "carol"), ("alice", "carol")]))
+
+    async def tenure():
+        return (
+            await database.get_follow_tenure(1, 0, ["alice", "carol"]),
+            await database.get_follow_history(1, 0, "carol"),
+        )
+
+    for convert in (False, True):
+        if convert:
+            run(database.compact_snapshots())
+        current, history = run(tenure())
+        assert current["alice"]["since_first_upload"] is True
+        assert current["carol"]["since_first_upload"] is False
+        assert current["carol"]["first_seen_at"].startswith("2024-01-02")
+        assert [episode["since_first_upload"] for episode in history] == [False]
+
+
+def test_recent_changes_lists_each_account_once(db_path):
+    async def churn():
+        for usernames in (
+            ("alice", "bob", "carol"),
+            ("alice", "bob", "dave"),
+            ("alice", "bob", "carol"),
+            ("alice", "bob"),
+        ):
+            await database.save_snapshot(1, 0, "churn.csv", frame(*usernames))
+        return await database.get_recent_changes(1, 0, days=30)
+
+    changes = run(churn())
+    # carol left twice and came back once; dave came and went
+    assert [record["username"] for record in changes["lost"]] == ["carol"]
+    assert changes["gained"] == []
+    assert (changes["gained_count"], changes["lost_count"]) == (0, 1)
+    assert (changes["old_total"], changes["new_total"], changes["net_change"]) == (3, 2, -1)
+
+
+def test_search_stays_within_the_users_history(db_path):
+    async def search():
+        first = await database.save_snapshot(1, 0, "mine.csv", frame("alice_x", "malice", "bob"))
+        await database.save_snapshot(1, 0, "mine.csv", frame("bob", "alicia_y"))
+        await database.save_snapshot(2, 0, "theirs.csv", frame("alice", "alicia", "palace", "malice"))
+        return (
+            await database.search_accounts(1, 0, "ali"),
+            await database.search_accounts(1, 0, "alice"),
+            await database.search_accounts(1, 0, "ali", snapshot_id=first),
+        )
+
+    series, typo, snapshot = run(search())
+    # Shared accounts (malice) are found; ones only another user uploaded aren't
+    assert [(r["username"], r["match"], r["current"]) for r in series] == [
+        ("alice_x", "prefix", False), ("alicia_y", "prefix", True), ("malice", "substring", False)
+    ]
+    assert {r["username"] for r in typo} <= {"alice_x", "alicia_y", "malice"}
+    assert [r["username"] for r in snapshot] == ["alice_x", "malice"]
@@ -0,0 +1,169 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Optional
+
+# Worker processes for other CPU-heavy work, such as parsing CSVs with
+# pandas, so it never runs on the event loop
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", str(min(4, os.cpu_count() or 1))))
+
+# Long-lived processes that only render charts. They import matplotlib and
+# render every chart once at startup, so the bot process never imports it.
+RENDER_PROCESSES = int(os.getenv("RENDER_PROCESSES", str(min(2, os.cpu_count() or 1))))
+
+# Seconds a single task may take before its worker is killed
+WORKER_TIMEOUT = float(os.getenv("WORKER_TIMEOUT", "60"))
+
+
+class WorkerPool:
+    """
+    A process pool whose tasks can be awaited with a timeout.
+
+    A process can't be interrupted part-way through a task, so when a task
+    times out the whole pool is replaced and its processes are terminated.
+    Other tasks still running in the old pool are run again, once, in the
+    new one.
+    """
+
+    def __init__(
+        self,
+        size: int = WORKER_PROCESSES,
+        initializer: Optional[Callable[[], Any]] = None
+    ):
+        self.size = max(1, size)
+        self._initializer = initializer
+        self._executor = self._new_executor()
+        self._starting: Optional[asyncio.Task] = None
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # Fresh interpreters: forking would copy the event loop and the
+        # database threads into every worker
+        return ProcessPoolExecutor(
+            max_workers=self.size,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=self._initializer
+        )
+
+    async def run(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        timeout: Optional[float] = WORKER_TIMEOUT
+    ) -> Any:
+        """
+        Run fn(*args) in a worker process and return its result.
+
+        `fn`, its arguments and its result must be picklable.
+
+        Raises:
+            TimeoutError: If the task took longer than `timeout` seconds
+            BrokenProcessPool: If a worker process died while running it
+        """
+        executor = self._executor
+        for attempt in range(2):
+            future = asyncio.get_running_loop().run_in_executor(executor, partial(fn, *args))
+            try:
+                return await asyncio.wait_for(future, timeout)
+            except TimeoutError:
+                self._replace(executor)
+                raise
+            except BrokenProcessPool:
+                if attempt or executor is self._executor:
+                    self._replace(executor)
+                    raise
+                # Killed along with a pool replaced after another task
+                # timed out, not by anything this task did
+                executor = self._executor
+
+    def _replace(self, executor: ProcessPoolExecutor):
+        """Swap in a new pool and kill the processes of `executor`."""
+        if executor is not self._executor:
+            return  # already replaced by another failed task
+        self._executor = self._new_executor()
+        processes = list((executor._processes or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+        if self._initializer:
+            # Get the new processes ready before the next task needs them
+            self._starting = asyncio.create_task(self.start())
+
+    async def start(self):
+        """Start every process now instead of on first use."""
+        # Processes are only added while none is idle, so one task per
+        # process, submitted together, starts all of them
+        await asyncio.gather(*(self.run(os.getpid, timeout=None) for _ in range(self.size)))
+
+    async def close(self):
+        """Cancel queued tasks and wait for running ones to finish."""
+        await asyncio.to_thread(self._executor.shutdown, wait=True, cancel_futures=True)
+
+
+def _warm_renderer():
+    from plotting import warm_up
+    warm_up()
+
+
+def _render(chart: str, *args: Any) -> bytes:
+    from plotting import render_chart
+    return render_chart(chart, *args)
+
+
+_pool: Optional[WorkerPool] = None
+_render_pool: Optional[WorkerPool] = None
+
+
+def start_workers(
+    size: Optional[int] = None,
+    render_size: Optional[int] = None
+) -> tuple[WorkerPool, WorkerPool]:
+    """Create the shared worker and rendering pools. Processes start on first use."""
+    global _pool, _render_pool
+    if _pool is None:
+        _pool = WorkerPool(size or WORKER_PROCESSES)
+    if _render_pool is None:
+        _render_pool = WorkerPool(render_size or RENDER_PROCESSES, initializer=_warm_renderer)
+    return _pool, _render_pool
+
+
+async def warm_workers():
+    """Start the rendering processes, so they are ready before the first chart."""
+    _, render_pool = start_workers()
+    await render_pool.start()
+
+
+async def stop_workers():
+    """Shut the shared pools down, if they were started."""
+    global _pool, _render_pool
+    pools, _pool, _render_pool = (_pool, _render_pool), None, None
+    for pool in pools:
+        if pool is not None:
+            await pool.close()
+
+
+async def run(
+    fn: Callable[..., Any],
+    *args: Any,
+    timeout: Optional[float] = WORKER_TIMEOUT
+) -> Any:
+    """Run fn(*args) in the shared worker pool, starting it if needed."""
+    pool, _ = start_workers()
+    return await pool.run(fn, *args, timeout=timeout)
+
+
+async def render(
+    chart: str,
+    *args: Any,
+    timeout: Optional[float] = WORKER_TIMEOUT
+) -> bytes:
+    """
+    Render a chart in a rendering process and return the PNG bytes.
+
+    `chart` is a name from plotting.CHARTS; `args` are plain data (snapshot
+    dicts, counts) passed to its create_* function.
+    """
+    _, render_pool = start_workers()
+    return await render_pool.run(_render, chart, *args, timeout=timeout)